@@ -1,41 +1,36 @@
+# Heavy subsystems (Selenium, ReportLab, Pillow, tabulate, Upstash) are imported
+# lazily where they are used so workers boot and answer /ping without them.
+from flask import Flask, render_template, request, session, redirect, url_for, make_response, g, send_from_directory
 import hashlib
-
-# Monkey-patch for openssl_md5() compatibility with Werkzeug's secure_filename
-if hashlib.md5:
-    _original_md5 = hashlib.md5
-    def _md5_patch(*args, **kwargs):
-        return _original_md5(*args)
-    hashlib.md5 = _md5_patch
-
-# Now import everything else
-from flask import Flask, render_template, request, session, redirect, url_for
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from tabulate import tabulate
 import time
 import re
 from datetime import datetime
 import os
-from PIL import Image
 import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
 import json
 import tempfile
-from werkzeug.utils import secure_filename
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from upstash_redis import Redis
 import logging
 import traceback
 import threading
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
 import queue
 import atexit
+import hmac
+import random
+import secrets
+from refresher import BackgroundRefresher
+from history_store import HistoryStore
+from attendance_index import AttendanceIndex
+from projection import build_projection, classes_needed, project
+from portal_health import PortalHealth
+from throttle import KeyedTokenBucket, NegativeCache, TokenBucket
+from http_cache import ResponseCompressor, data_version, make_etag
+from scheduler import BACKGROUND, INTERACTIVE, LAB_METADATA, UPLOAD
+from profiling import ProfileStore, SamplingProfiler
+from calendar_svg import CalendarCache, render_calendar
+from attendance_delta import advance, changes_since
+from browser_broker import BrokerPool
+from webdriver_pool import MAX_DRIVERS, build_local_pool
 
 # Configure logging
 logging.basicConfig(
@@ -49,194 +44,75 @@ app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-only-secret")
 
 COLLEGE_LOGIN_URL = "https://samvidha.iare.ac.in/"
 ATTENDANCE_URL = "https://samvidha.iare.ac.in/home?action=course_content"
+LAB_RECORD_URL = "https://samvidha.iare.ac.in/home?action=labrecord_std"
 
-# WebDriver pool for handling concurrent requests
-class WebDriverPool:
-    def __init__(self, max_drivers=10):
-        self.max_drivers = max_drivers
-        self.available_drivers = queue.Queue()
-        self.active_drivers = set()
-        self.lock = threading.Lock()
-        
-    def get_driver(self, timeout=30):
-        """Get a WebDriver instance from the pool"""
-        try:
-            # Try to get an existing driver
-            driver = self.available_drivers.get_nowait()
-            with self.lock:
-                self.active_drivers.add(driver)
-            return driver
-        except queue.Empty:
-            # Create new driver if under limit
-            with self.lock:
-                if len(self.active_drivers) < self.max_drivers:
-                    try:
-                        driver = self._create_driver()
-                        self.active_drivers.add(driver)
-                        logger.info(f"Created new WebDriver. Active: {len(self.active_drivers)}")
-                        return driver
-                    except Exception as e:
-                        logger.error(f"Failed to create WebDriver: {e}")
-                        raise
-            
-            # Wait for available driver
-            try:
-                driver = self.available_drivers.get(timeout=timeout)
-                with self.lock:
-                    self.active_drivers.add(driver)
-                return driver
-            except queue.Empty:
-                raise TimeoutError("No WebDriver available within timeout")
-    
-    def return_driver(self, driver):
-        """Return a WebDriver instance to the pool"""
-        try:
-            # Reset driver state
-            driver.delete_all_cookies()
-            driver.get("about:blank")
-            
-            with self.lock:
-                self.active_drivers.discard(driver)
-            self.available_drivers.put(driver)
-        except Exception as e:
-            logger.error(f"Error returning driver to pool: {e}")
-            self._cleanup_driver(driver)
-    
-    def _create_driver(self):
-        """Create a new WebDriver instance"""
-        options = self._build_chrome_options()
-        service = self._create_chromedriver_service()
-        
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.set_page_load_timeout(30)
-        driver.implicitly_wait(10)
-        return driver
-    
-    def _build_chrome_options(self):
-        """Build Chrome options for WebDriver"""
-        options = Options()
-        options.add_argument("--headless=new")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1920,1080")
-        options.add_argument("--disable-extensions")
-        options.add_argument("--disable-plugins")
-        options.add_argument("--disable-images")
-        options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option('useAutomationExtension', False)
-        
-        # Try to find Chrome binary
-        candidate_bins = [
-            os.environ.get("CHROME_BIN"),
-            "/opt/render/project/src/.chrome-for-testing/chrome-linux64/chrome",
-            "/app/.chrome-for-testing/chrome-linux64/chrome",
-            "/usr/bin/chromium-browser",
-            "/usr/bin/chromium",
-            "/usr/bin/google-chrome",
-            "/usr/bin/google-chrome-stable",
-            "/opt/google/chrome/chrome",
-        ]
-        
-        for binary in candidate_bins:
-            if binary and os.path.isfile(binary):
-                options.binary_location = binary
-                logger.info(f"Using Chrome binary: {binary}")
-                break
-        else:
-            logger.warning("No Chrome binary found, using system default")
-        
-        return options
-    
-    def _create_chromedriver_service(self):
-        """Create ChromeDriver service"""
-        candidates = [
-            os.environ.get("CHROMEDRIVER_PATH"),
-            "/opt/render/project/src/.chrome-for-testing/chromedriver-linux64/chromedriver",
-            "/app/.chrome-for-testing/chromedriver-linux64/chromedriver",
-            "/usr/bin/chromedriver",
-            "/usr/lib/chromium-browser/chromedriver",
-            "/usr/lib/chromium/chromedriver",
-        ]
-        
-        for path in candidates:
-            if path and os.path.isfile(path):
-                logger.info(f"Using ChromeDriver: {path}")
-                return Service(path)
-        
-        # Fallback to webdriver-manager
-        try:
-            # Only try webdriver-manager if we have Chrome available
-            chrome_available = any(
-                binary and os.path.isfile(binary) 
-                for binary in [
-                    "/usr/bin/google-chrome",
-                    "/usr/bin/google-chrome-stable",
-                    "/usr/bin/chromium-browser",
-                    "/usr/bin/chromium"
-                ]
-            )
-            if chrome_available:
-                path = ChromeDriverManager().install()
-                logger.info(f"ChromeDriver installed via webdriver-manager: {path}")
-                return Service(path)
-            else:
-                logger.error("No Chrome binary found for webdriver-manager")
-                raise Exception("Chrome binary not found")
-        except Exception as e:
-            logger.error(f"Failed to install ChromeDriver: {e}")
-            raise Exception(f"ChromeDriver setup failed: {e}")
-    
-    def _cleanup_driver(self, driver):
-        """Clean up a WebDriver instance"""
-        try:
-            driver.quit()
-        except Exception as e:
-            logger.error(f"Error cleaning up driver: {e}")
-        finally:
-            with self.lock:
-                self.active_drivers.discard(driver)
-    
-    def cleanup_all(self):
-        """Clean up all WebDriver instances"""
-        logger.info("Cleaning up WebDriver pool...")
-        
-        # Clean up available drivers
-        while not self.available_drivers.empty():
-            try:
-                driver = self.available_drivers.get_nowait()
-                self._cleanup_driver(driver)
-            except queue.Empty:
-                break
-        
-        # Clean up active drivers
-        with self.lock:
-            for driver in list(self.active_drivers):
-                self._cleanup_driver(driver)
-
-# Global WebDriver pool
-driver_pool = WebDriverPool(max_drivers=3)  # Reduce concurrent drivers for Render
+# Global WebDriver pool. With a browser broker (browser_broker.py) the Chromes live
+# in the broker process and survive worker restarts; workers only lease sessions.
+BROWSER_BROKER_SOCKET = os.environ.get("BROWSER_BROKER_SOCKET", "")
+driver_pool = BrokerPool(BROWSER_BROKER_SOCKET, MAX_DRIVERS) if BROWSER_BROKER_SOCKET else build_local_pool()
 
 # Cleanup on exit
 atexit.register(driver_pool.cleanup_all)
+
+# Portal circuit breaker and adaptive per-step timeouts
+portal_health = PortalHealth(
+    failure_threshold=int(os.environ.get("PORTAL_FAILURE_THRESHOLD", "5")),
+    open_seconds=int(os.environ.get("PORTAL_OPEN_SECONDS", "60")),
+)
+PORTAL_DOWN_MESSAGE = "The college portal is not responding right now. Please try again in a few minutes."
+PORTAL_SLOW_MESSAGE = "The college portal took too long to log you in. Please try again in a moment."
+
+# Hedged scrapes: a backup attempt may start once the first one passes the learned
+# p90, spending at most HEDGE_BUDGET_RATIO extra scrapes per primary scrape.
+HEDGE_SCRAPES = os.environ.get("HEDGE_SCRAPES", "0") == "1"
+HEDGE_BUDGET_RATIO = float(os.environ.get("HEDGE_BUDGET_RATIO", "0.05"))
+hedge_budget = TokenBucket(rate_per_second=0, capacity=3, initial=0)
+_scrape_executor = ThreadPoolExecutor(max_workers=2 * driver_pool.max_drivers, thread_name_prefix="scrape")
+
+# Speculatively read the lab record page in the attendance scrape's session
+LAB_PREFETCH = os.environ.get("LAB_PREFETCH", "1") == "1"
+LAB_INDEX_TTL = int(os.environ.get("LAB_INDEX_TTL_SECONDS", "3600"))
+_prefetch_executor = ThreadPoolExecutor(max_workers=driver_pool.max_drivers, thread_name_prefix="lab-prefetch")
+
+# Image-to-PDF conversion runs here, overlapped with the portal login for uploads
+_pdf_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf")
+
+# Rejected credentials are remembered briefly so retries never reach a browser,
+# and each username gets a small budget of live scrape attempts.
+failed_logins = NegativeCache(ttl_seconds=int(os.environ.get("FAILED_LOGIN_TTL_SECONDS", "300")))
+SCRAPE_ATTEMPTS_PER_10_MIN = float(os.environ.get("SCRAPE_ATTEMPTS_PER_10_MIN", "6"))
+scrape_attempts = KeyedTokenBucket(rate_per_second=SCRAPE_ATTEMPTS_PER_10_MIN / 600.0, capacity=3)
+
 # Optional: Upstash Redis cache (falls back to in-memory)
 UP_REDIS_URL = os.environ.get("UPSTASH_REDIS_REST_URL")
 UP_REDIS_TOKEN = os.environ.get("UPSTASH_REDIS_REST_TOKEN")
 
-redis_client = None
-if UP_REDIS_URL and UP_REDIS_TOKEN:
-    try:
-        redis_client = Redis(url=UP_REDIS_URL, token=UP_REDIS_TOKEN)
-        logger.info("Connected to Upstash Redis")
-    except Exception:
-        redis_client = None
-        logger.warning("Failed to connect to Redis, using in-memory cache")
+_redis_client = None
+_redis_checked = False
+_redis_lock = threading.Lock()
+
+def get_redis_client():
+    """Connect to Upstash on first cache access instead of at import time"""
+    global _redis_client, _redis_checked
+    if _redis_checked:
+        return _redis_client
+    with _redis_lock:
+        if not _redis_checked:
+            if UP_REDIS_URL and UP_REDIS_TOKEN:
+                try:
+                    from upstash_redis import Redis
+                    _redis_client = Redis(url=UP_REDIS_URL, token=UP_REDIS_TOKEN)
+                    logger.info("Connected to Upstash Redis")
+                except Exception:
+                    _redis_client = None
+                    logger.warning("Failed to connect to Redis, using in-memory cache")
+            _redis_checked = True
+    return _redis_client
 
 _inmem_cache = {}
 
 def cache_set(key, value, ttl_seconds=1800):
+    redis_client = get_redis_client()
     if redis_client:
         try:
             redis_client.set(key, json.dumps(value), ex=ttl_seconds)
@@ -247,6 +123,7 @@ def cache_set(key, value, ttl_seconds=1800):
     _inmem_cache[key] = (time.time() + ttl_seconds, value)
 
 def cache_get(key):
+    redis_client = get_redis_client()
     if redis_client:
         try:
             v = redis_client.get(key)
@@ -263,15 +140,158 @@ def cache_get(key):
         return None
     return val
 
-def get_attendance_data(username, password):
-    """Get attendance data using WebDriver pool"""
+def cache_pop(key):
+    """Read and delete a key in one step, so a one-time value can be claimed only once"""
+    redis_client = get_redis_client()
+    if redis_client:
+        try:
+            v = redis_client.getdel(key)
+            return json.loads(v) if v else None
+        except Exception as e:
+            logger.error(f"Redis cache pop error: {e}")
+            pass
+    entry = _inmem_cache.pop(key, None)
+    if not entry or time.time() > entry[0]:
+        return None
+    return entry[1]
+
+# Durable per-course, per-day history; set HISTORY_DB_PATH to "" to disable
+HISTORY_DB_PATH = os.environ.get(
+    "HISTORY_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "attendance_history.db"),
+)
+history_store = HistoryStore(HISTORY_DB_PATH) if HISTORY_DB_PATH else None
+
+def _credential_digest(username, password):
+    """Salted hash of a user's credentials, safe to keep in the cache"""
+    message = f"{username}\0{password}".encode()
+    return hmac.new(app.secret_key.encode(), message, hashlib.sha256).hexdigest()
+
+def _store_attendance(username, password, data):
+    """Cache fresh attendance, plus a long-lived copy to fall back on while the portal is down"""
+    # Pages rendered from this data are versioned by its content (see _versioned_page)
+    data["version"] = data_version(data)
+    # Integer revisions and per-revision deltas behind /api/attendance?since=
+    previous = cache_get(f"att_last:{username}")
+    log = advance(cache_get(f"att_log:{username}"), previous and previous.get("data"), data)
+    cache_set(f"att_log:{username}", log, ttl_seconds=30 * 86400)
+    cache_set(f"att:{username}", data, ttl_seconds=1800)
+    cache_set(f"att_last:{username}", {
+        "fetched_at": datetime.now().strftime("%d-%m-%Y %H:%M"),
+        "auth": _credential_digest(username, password),
+        "data": data,
+    }, ttl_seconds=7 * 86400)
+    if history_store:
+        try:
+            history_store.record(username, data)
+        except Exception as e:
+            logger.error(f"History store write failed for {username}: {e}")
+
+def _fetched_timestamp(fetched_at):
+    """Unix time of a stored "fetched_at" (minute precision), or None"""
+    try:
+        return datetime.strptime(fetched_at or "", "%d-%m-%Y %H:%M").timestamp()
+    except ValueError:
+        return None
+
+def _last_known_attendance(username, password):
+    """Last successfully scraped data for these credentials, or (None, None)"""
+    entry = cache_get(f"att_last:{username}")
+    if not entry or not hmac.compare_digest(entry.get("auth", ""), _credential_digest(username, password)):
+        return None, None
+    return entry["data"], entry["fetched_at"]
+
+# Scraping engine: "selenium" (pooled Chrome per request) or "async" (one Chrome, many contexts)
+SCRAPE_ENGINE = os.environ.get("SCRAPE_ENGINE", "selenium").lower()
+ASYNC_MAX_CONTEXTS = int(os.environ.get("ASYNC_MAX_CONTEXTS", "20"))
+
+_async_engine = None
+_async_engine_lock = threading.Lock()
+
+def get_async_engine():
+    """Create the shared async scrape engine on first use"""
+    global _async_engine
+    if _async_engine is None:
+        with _async_engine_lock:
+            if _async_engine is None:
+                from async_scraper import AsyncScrapeEngine
+                _async_engine = AsyncScrapeEngine(
+                    parse_rows=calculate_attendance_percentage,
+                    login_url=COLLEGE_LOGIN_URL,
+                    attendance_url=ATTENDANCE_URL,
+                    max_contexts=ASYNC_MAX_CONTEXTS,
+                    executable_path=os.environ.get("CHROME_BIN"),
+                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+                    login_rejected=LOGIN_REJECTED_PATTERN,
+                )
+                atexit.register(_async_engine.close)
+    return _async_engine
+
+def _get_attendance_data_async(username, password):
+    """Get attendance data using the asyncio engine"""
+    try:
+        data = get_async_engine().scrape(username, password)
+    except TimeoutError:
+        logger.error(f"Async scrape timed out for user: {username}")
+        portal_health.record_failure()
+        return {"error": "System busy, please try again in a moment"}
+    except Exception as e:
+        logger.error(f"Async scrape error for user {username}: {e}")
+        portal_health.record_failure()
+        return {"error": f"System error: {str(e)}"}
+    if "subjects" in data:
+        portal_health.record_success()
+    elif data.get("transient"):
+        # The login redirect timed out
+        portal_health.record_failure()
+    return data
+
+def get_attendance_data(username, password, work_class=INTERACTIVE, on_course=None, rate_limit=True):
+    """Get attendance data using WebDriver pool; `on_course` sees each course as it is parsed.
+
+    `rate_limit=False` skips the per-username attempt budget, for callers
+    with their own pacing (the background refresher).
+    """
+    digest = _credential_digest(username, password)
+    if digest in failed_logins:
+        logger.info(f"Rejected cached bad credentials for user: {username}")
+        return {"error": "Invalid username or password.", "invalid_credentials": True}
+    if rate_limit and not scrape_attempts.try_acquire(username):
+        logger.warning(f"Scrape rate limit hit for user: {username}")
+        return {"error": "Too many login attempts. Please wait a few minutes and try again."}
+
+    data = _fetch_attendance_data(username, password, work_class, on_course)
+    if data.get("invalid_credentials"):
+        failed_logins.add(digest)
+    return data
+
+def _fetch_attendance_data(username, password, work_class=INTERACTIVE, on_course=None):
+    """Run a live scrape with whichever engine is configured"""
+    if not portal_health.allow_request():
+        logger.warning(f"Portal circuit open, skipping scrape for user: {username}")
+        return {"error": PORTAL_DOWN_MESSAGE, "portal_down": True}
+
+    if SCRAPE_ENGINE == "async":
+        return _get_attendance_data_async(username, password)
+
+    if HEDGE_SCRAPES and work_class != BACKGROUND:
+        return _hedged_scrape(username, password, work_class, on_course)
+    return _pooled_scrape(username, password, work_class=work_class, on_course=on_course)
+
+def _pooled_scrape(username, password, cancel=None, timeout=30, work_class=INTERACTIVE, on_course=None):
+    """Check out a pooled driver and scrape attendance with it"""
     driver = None
     try:
         # Get driver from pool
-        driver = driver_pool.get_driver(timeout=30)
+        driver = driver_pool.get_driver(timeout=timeout, work_class=work_class)
         logger.info(f"Got WebDriver for user: {username}")
         
-        return _scrape_attendance_data(driver, username, password)
+        data = _scrape_attendance_data(driver, username, password, cancel=cancel, on_course=on_course)
+        if _should_prefetch_lab_index(username, password, data, cancel):
+            # Hand the still-authenticated driver to the prefetcher, which returns it to the pool
+            _prefetch_executor.submit(_prefetch_lab_index, driver, username, password)
+            driver = None
+        return data
         
     except TimeoutError:
         logger.error("Timeout waiting for WebDriver")
@@ -286,82 +306,287 @@ def get_attendance_data(username, password):
         if driver:
             driver_pool.return_driver(driver)
 
-def _scrape_attendance_data(driver, username, password):
-    """Scrape attendance data using provided WebDriver"""
+def _should_prefetch_lab_index(username, password, data, cancel):
+    if not LAB_PREFETCH or "error" in data or (cancel is not None and cancel.is_set()):
+        return False
+    # Never hold a driver for prefetching while interactive users are queued
+    if driver_pool.waiting > 0:
+        return False
+    return not _cached_lab_index(username, password)
+
+def _prefetch_lab_index(driver, username, password):
+    """Read the lab subjects and experiment tables while the session is still logged in"""
+    try:
+        started = time.time()
+        driver.get(LAB_RECORD_URL)
+        subjects = _read_lab_subjects(driver)
+        experiments = {}
+        for subject in subjects:
+            if driver_pool.waiting > 0:
+                logger.info(f"Stopping lab prefetch for {username}: pool is busy")
+                break
+            experiments[subject['value']] = _read_lab_experiments(driver, subject['value'])
+        if subjects:
+            cache_set(f"lab:{username}", {
+                "auth": _credential_digest(username, password),
+                "subjects": subjects,
+                "experiments": experiments,
+            }, ttl_seconds=LAB_INDEX_TTL)
+        logger.info(f"Prefetched lab index for {username} ({len(experiments)}/{len(subjects)} labs) in {time.time() - started:.1f}s")
+    except Exception as e:
+        logger.error(f"Lab prefetch failed for user {username}: {e}")
+    finally:
+        driver_pool.return_driver(driver)
+
+def _is_final_result(data):
+    return "error" not in data or data.get("invalid_credentials")
+
+class _CourseRelay:
+    """Passes one scrape attempt's courses to `on_course`, live or held until the attempt wins"""
+
+    def __init__(self, on_course, live=True):
+        self.on_course = on_course
+        self.live = live
+        self.held = []
+        self.lock = threading.Lock()
+
+    def __call__(self, code, sub):
+        with self.lock:
+            if not self.live:
+                self.held.append((code, dict(sub)))
+                return
+        self.on_course(code, sub)
+
+    def hold(self):
+        with self.lock:
+            self.live = False
+
+    def flush(self):
+        with self.lock:
+            held, self.held = self.held, []
+        for code, sub in held:
+            self.on_course(code, sub)
+
+def _hedged_scrape(username, password, work_class=INTERACTIVE, on_course=None):
+    """Scrape, starting a backup attempt on an idle driver if the first one runs past p90.
+
+    Courses stream live from the first attempt until a hedge starts; from then
+    on each attempt holds its courses and only the winner's are passed on.
+    """
+    hedge_budget.deposit(HEDGE_BUDGET_RATIO)
+    deadline = portal_health.percentile("scrape", 90)
+    primary_cancel = threading.Event()
+    primary_relay = _CourseRelay(on_course) if on_course else None
+    primary = _scrape_executor.submit(_pooled_scrape, username, password, primary_cancel,
+                                      work_class=work_class, on_course=primary_relay)
+    if deadline is None:
+        return primary.result()
+
+    try:
+        return primary.result(timeout=deadline)
+    except TimeoutError:
+        pass
+
+    # Only hedge with genuinely spare capacity, never ahead of queued users
+    if driver_pool.waiting > 0 or driver_pool.free_capacity() <= 0 or not hedge_budget.try_acquire():
+        return primary.result()
+
+    logger.info(f"Scrape for {username} passed p90 ({deadline:.1f}s), starting hedged attempt")
+    hedge_cancel = threading.Event()
+    hedge_relay = None
+    if on_course:
+        primary_relay.hold()
+        hedge_relay = _CourseRelay(on_course, live=False)
+    hedge = _scrape_executor.submit(_pooled_scrape, username, password, hedge_cancel, 1, work_class, hedge_relay)
+    attempts = {primary: primary_cancel, hedge: hedge_cancel}
+    relays = {primary: primary_relay, hedge: hedge_relay}
+
+    result = None
+    winner = None
+    for future in as_completed(attempts):
+        result = future.result()
+        winner = future
+        if _is_final_result(result):
+            break
+    # The loser stops at its next step boundary and returns its driver to the pool
+    for cancel in attempts.values():
+        cancel.set()
+    if relays[winner]:
+        relays[winner].flush()
+    return result
+
+class PortalUnavailable(Exception):
+    """The portal failed during login; _portal_login has already recorded it with portal_health"""
+
+class LoginTimeout(PortalUnavailable):
+    """The portal neither accepted nor rejected the login in time; says nothing about the password"""
+
+# Text the login page shows (or alerts) when it refuses the credentials
+LOGIN_REJECTED_PATTERN = re.compile(r"invalid|incorrect|wrong|does not match|not registered", re.IGNORECASE)
+
+def _login_outcome(driver):
+    """"home" once the portal has let us in, "rejected" once it has refused us, else False"""
+    from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import NoAlertPresentException
+
+    try:
+        alert = driver.switch_to.alert
+        text = alert.text
+        alert.accept()
+        if LOGIN_REJECTED_PATTERN.search(text or ""):
+            return "rejected"
+    except NoAlertPresentException:
+        pass
+    if "home" in driver.current_url:
+        return "home"
+    # Still on the login form with an error next to it
+    if driver.find_elements(By.ID, "txt_pwd"):
+        body = driver.find_elements(By.TAG_NAME, "body")
+        if body and LOGIN_REJECTED_PATTERN.search(body[0].text):
+            return "rejected"
+    return False
+
+def _portal_login(driver, username, password):
+    """Log in to Samvidha on the given driver.
+
+    Returns False only if the portal rejected the credentials; raises
+    LoginTimeout if it did not answer in time.
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
+
+    driver.set_page_load_timeout(portal_health.timeout_for("page_load", 30))
+    started = time.time()
     try:
-        logger.info(f"Starting attendance scrape for user: {username}")
         driver.get(COLLEGE_LOGIN_URL)
-        time.sleep(2)
+    except Exception as e:
+        portal_health.record_failure()
+        raise PortalUnavailable(f"Login page did not load: {e}") from e
+    portal_health.record_latency("page_load", time.time() - started)
 
-        try:
-            driver.find_element(By.ID, "txt_uname").send_keys(username)
-            driver.find_element(By.ID, "txt_pwd").send_keys(password)
-            driver.find_element(By.ID, "but_submit").click()
-        except Exception:
-            # Fallback: Try generic input selection
-            inputs = driver.find_elements(By.TAG_NAME, "input")
-            if len(inputs) >= 2:
-                inputs[0].send_keys(username)
-                inputs[1].send_keys(password)
-                # Try to find and click the login button
-                try:
-                    driver.find_element(By.ID, "but_submit").click()
-                except:
-                    driver.find_element(By.CSS_SELECTOR, "input[type='submit']").click()
-            else:
-                raise Exception("Could not find login input fields")
+    try:
+        driver.find_element(By.ID, "txt_uname").send_keys(username)
+        driver.find_element(By.ID, "txt_pwd").send_keys(password)
+        driver.find_element(By.ID, "but_submit").click()
+    except Exception:
+        # Fallback: Try generic input selection
+        inputs = driver.find_elements(By.TAG_NAME, "input")
+        if len(inputs) >= 2:
+            inputs[0].send_keys(username)
+            inputs[1].send_keys(password)
+            # Try to find and click the login button
+            try:
+                driver.find_element(By.ID, "but_submit").click()
+            except:
+                driver.find_element(By.CSS_SELECTOR, "input[type='submit']").click()
+        else:
+            raise Exception("Could not find login input fields")
 
-        time.sleep(3)
-        # Better login check
-        if "home" not in driver.current_url:
+    # Wait for the redirect to home (or an explicit rejection) instead of sleeping a fixed amount
+    started = time.time()
+    timeout = portal_health.timeout_for("login", 5)
+    try:
+        outcome = WebDriverWait(driver, timeout, poll_frequency=0.25).until(_login_outcome)
+    except TimeoutException:
+        portal_health.record_failure()
+        raise LoginTimeout(f"No answer to the login within {timeout:.1f}s")
+    # A rejection is still a portal answer: it closes a half-open probe like a successful login
+    portal_health.record_latency("login", time.time() - started)
+    portal_health.record_success()
+    return outcome != "rejected"
+
+def _wait_for_rows(driver, timeout):
+    """Wait until the course table has rendered and stopped growing"""
+    from selenium.webdriver.common.by import By
+
+    deadline = time.time() + timeout
+    last_count = -1
+    driver.implicitly_wait(0)
+    try:
+        while True:
+            count = len(driver.find_elements(By.TAG_NAME, "tr"))
+            if (count and count == last_count) or time.time() >= deadline:
+                break
+            last_count = count
+            time.sleep(0.5)
+    finally:
+        driver.implicitly_wait(10)
+    return driver.find_elements(By.TAG_NAME, "tr")
+
+class ScrapeCancelled(Exception):
+    """Raised inside a scrape whose result is no longer wanted"""
+
+def _check_cancelled(cancel):
+    if cancel is not None and cancel.is_set():
+        raise ScrapeCancelled()
+
+def _scrape_attendance_data(driver, username, password, cancel=None, on_course=None):
+    """Scrape attendance data using provided WebDriver"""
+    from selenium.webdriver.common.by import By
+
+    scrape_started = time.time()
+    try:
+        logger.info(f"Starting attendance scrape for user: {username}")
+        _check_cancelled(cancel)
+        if not _portal_login(driver, username, password):
             logger.warning(f"Login failed for user: {username}")
-            return {"error": "Invalid username or password."}
+            return {"error": "Invalid username or password.", "invalid_credentials": True}
+        _check_cancelled(cancel)
 
         # Instead of forcing get(), click the menu item for Attendance
+        started = time.time()
         try:
             attendance_link = driver.find_element(By.LINK_TEXT, "Course Content")
             attendance_link.click()
         except:
             driver.get(ATTENDANCE_URL)
 
-        time.sleep(3)
-        rows = driver.find_elements(By.TAG_NAME, "tr")
+        rows = _wait_for_rows(driver, portal_health.timeout_for("course_content", 6))
+        _check_cancelled(cancel)
 
         if not rows:
             logger.warning(f"No attendance data found for user: {username}")
+            portal_health.record_failure()
             return {"error": "No attendance data found (maybe server issue)."}
+        portal_health.record_latency("course_content", time.time() - started)
 
         logger.info(f"Successfully scraped attendance data for user: {username}")
-        return calculate_attendance_percentage(rows)
-
+        result = calculate_attendance_percentage(rows, on_course=on_course)
+        portal_health.record_latency("scrape", time.time() - scrape_started)
+        return result
+
+    except ScrapeCancelled:
+        logger.info(f"Cancelled hedged scrape for user: {username}")
+        return {"error": "Scrape cancelled", "cancelled": True}
+    except LoginTimeout as e:
+        # Not a verdict on the password, so it must not reach failed_logins
+        logger.warning(f"Login timed out for user {username}: {e}")
+        return {"error": PORTAL_SLOW_MESSAGE, "transient": True}
+    except PortalUnavailable as e:
+        logger.error(f"Portal unavailable for user {username}: {e}")
+        return {"error": f"Exception: {str(e)}"}
     except Exception as e:
         logger.error(f"Scraping error for user {username}: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
+        portal_health.record_failure()
         return {"error": f"Exception: {str(e)}"}
 
-def calculate_attendance_percentage(rows):
-    result = {
-        "subjects": {},
-        "overall": {
-            "present": 0,
-            "absent": 0,
-            "percentage": 0.0,
-            "success": False,
-            "message": ""
-        },
-        "date_attendance": {},
-        "per_course_date_attendance": {},
-        "streak": 0,
-        "attended_days": 0,
-        "absent_days": 0,
-        "safe_bunk_days": 0
-    }
+def _finish_subject(sub):
+    total = sub["present"] + sub["absent"]
+    if total > 0:
+        sub["percentage"] = round((sub["present"] / total) * 100, 2)
+    sub["safe_bunk_periods"] = max(0, sub["present"] // 3 - sub["absent"])
+
+def iter_attendance_rows(rows, result, day_records):
+    """Parse course-content rows into `result`, yielding (code, subject) as each course's rows end.
 
+    Rows are read lazily, so with Selenium elements every course is reported
+    while later rows are still being fetched from the browser. Period totals
+    accumulate in result["overall"] and dated rows in `day_records`.
+    """
     current_course = None
-    total_present = 0
-    total_absent = 0
-    date_attendance = {}
-    per_course_date_attendance = {}
+    overall = result["overall"]
 
     for row in rows:
         text = row.text.strip().upper()
@@ -370,6 +595,9 @@ def calculate_attendance_percentage(rows):
 
         course_match = re.match(r"^(A[A-Z]+\d+|ACDD05)\s*[-:\s]+\s*(.+)$", text)
         if course_match:
+            if current_course:
+                _finish_subject(result["subjects"][current_course])
+                yield current_course, result["subjects"][current_course]
             current_course = course_match.group(1)
             course_name = course_match.group(2).strip()
             result["subjects"][current_course] = {
@@ -378,7 +606,6 @@ def calculate_attendance_percentage(rows):
                 "absent": 0,
                 "percentage": 0.0
             }
-            per_course_date_attendance[current_course] = {}
             continue
 
         if current_course:
@@ -386,8 +613,8 @@ def calculate_attendance_percentage(rows):
             absent_count = text.count("ABSENT")
             result["subjects"][current_course]["present"] += present_count
             result["subjects"][current_course]["absent"] += absent_count
-            total_present += present_count
-            total_absent += absent_count
+            overall["present"] += present_count
+            overall["absent"] += absent_count
 
             # Enhanced date matching for various formats
             date_match = re.search(r'(\d{1,2}\s[A-Za-z]{3},?\s\d{4}|\d{1,2}[-/]\d{1,2}[-/]\d{4}|\d{1,2}\s[A-Za-z]{3})', text)
@@ -412,31 +639,52 @@ def calculate_attendance_percentage(rows):
                         dt = datetime.strptime(date_str, "%d-%m-%Y")
                     else:
                         continue
-                    
-                    date_key = dt.strftime("%d-%m-%Y")
                 except (ValueError, AttributeError):
                     continue
                 
-                if date_key not in date_attendance:
-                    date_attendance[date_key] = {'present': 0, 'absent': 0}
-                date_attendance[date_key]['present'] += present_count
-                date_attendance[date_key]['absent'] += absent_count
+                day_records.append((current_course, dt.date(), present_count, absent_count))
 
-                if date_key not in per_course_date_attendance[current_course]:
-                    per_course_date_attendance[current_course][date_key] = {'present': 0, 'absent': 0}
-                per_course_date_attendance[current_course][date_key]['present'] += present_count
-                per_course_date_attendance[current_course][date_key]['absent'] += absent_count
+    if current_course:
+        _finish_subject(result["subjects"][current_course])
+        yield current_course, result["subjects"][current_course]
 
-    for sub_key, sub in result["subjects"].items():
-        total = sub["present"] + sub["absent"]
-        if total > 0:
-            sub["percentage"] = round((sub["present"] / total) * 100, 2)
-        sub["safe_bunk_periods"] = max(0, sub["present"] // 3 - sub["absent"])
+def calculate_attendance_percentage(rows, on_course=None):
+    """Parse scraped rows; `on_course(code, subject)` is called as each course completes.
 
-        course_dates = per_course_date_attendance.get(sub_key, {})
-        sub["attended_days"] = len([d for d in course_dates if course_dates[d]['present'] > 0])
-        sub["absent_days"] = len([d for d in course_dates if course_dates[d]['present'] == 0 and course_dates[d]['absent'] > 0])
-        sub["safe_bunk_days"] = max(0, sub["attended_days"] // 3 - sub["absent_days"])
+    Day-level counts are returned only as `day_index` (see AttendanceIndex);
+    the `date_attendance` and `per_course_date_attendance` dicts of earlier
+    results are no longer produced. AttendanceIndex.from_result still reads
+    them from results cached before the change.
+    """
+    result = {
+        "subjects": {},
+        "overall": {
+            "present": 0,
+            "absent": 0,
+            "percentage": 0.0,
+            "success": False,
+            "message": ""
+        },
+        "day_index": {},
+        "streak": 0,
+        "attended_days": 0,
+        "absent_days": 0,
+        "safe_bunk_days": 0
+    }
+
+    day_records = []
+    for code, sub in iter_attendance_rows(rows, result, day_records):
+        if on_course:
+            on_course(code, sub)
+    total_present = result["overall"]["present"]
+    total_absent = result["overall"]["absent"]
+
+    day_index = AttendanceIndex.from_records(day_records)
+
+    for sub_key, sub in result["subjects"].items():
+        sub["attended_days"] = day_index.attended_days(sub_key)
+        sub["absent_days"] = day_index.absent_days(sub_key)
+        sub["safe_bunk_days"] = day_index.safe_bunk_days(sub_key)
 
     overall_total = total_present + total_absent
     if overall_total > 0:
@@ -450,29 +698,132 @@ def calculate_attendance_percentage(rows):
             "safe_bunk_periods": max(0, total_present // 3 - total_absent)
         }
 
-    result["date_attendance"] = date_attendance
-    result["per_course_date_attendance"] = per_course_date_attendance
-
-    # Calculate streak and other date-based metrics
-    if date_attendance:
-        try:
-            dates = sorted(date_attendance.keys(), key=lambda x: datetime.strptime(x, "%d-%m-%Y"))
-        except ValueError:
-            dates = list(date_attendance.keys())
-            
-        streak = 0
-        for d in reversed(dates):
-            if date_attendance[d]['present'] > 0:
-                streak += 1
-            else:
-                break
-        result["streak"] = streak
-        result["attended_days"] = len([d for d in date_attendance if date_attendance[d]['present'] > 0])
-        result["absent_days"] = len([d for d in date_attendance if date_attendance[d]['present'] == 0 and date_attendance[d]['absent'] > 0])
-        result["safe_bunk_days"] = max(0, result["attended_days"] // 3 - result["absent_days"])
+    # Day-level data travels as packed per-course arrays; see attendance_index
+    result["day_index"] = day_index.to_json()
+    result["streak"] = day_index.streak()
+    result["attended_days"] = day_index.attended_days()
+    result["absent_days"] = day_index.absent_days()
+    result["safe_bunk_days"] = day_index.safe_bunk_days()
 
     return result
 
+def _refresh_attendance_cache(username, password):
+    """Re-scrape a user's attendance in the background and update the cache"""
+    # Paced by the refresher's own bucket; the user's login attempts stay untouched
+    data = get_attendance_data(username, password, work_class=BACKGROUND, rate_limit=False)
+    if "error" in data:
+        logger.warning(f"Background refresh skipped cache update for {username}: {data['error']}")
+        return False
+    _store_attendance(username, password, data)
+    return True
+
+def _pool_under_pressure():
+    # Keep REFRESH_RESERVE_DRIVERS free for interactive users at all times
+    return driver_pool.waiting > 0 or driver_pool.free_capacity() <= REFRESH_RESERVE_DRIVERS
+
+# Background refresher for recently active users (disabled unless BACKGROUND_REFRESH=1)
+BACKGROUND_REFRESH = os.environ.get("BACKGROUND_REFRESH", "0") == "1"
+REFRESH_RESERVE_DRIVERS = int(os.environ.get("REFRESH_RESERVE_DRIVERS", "1"))
+
+background_refresher = BackgroundRefresher(
+    refresh_fn=_refresh_attendance_cache,
+    is_busy=_pool_under_pressure,
+    active_days=int(os.environ.get("REFRESH_ACTIVE_DAYS", "3")),
+    cache_ttl=1800,
+    refresh_margin=int(os.environ.get("REFRESH_MARGIN_SECONDS", "300")),
+    refreshes_per_minute=float(os.environ.get("REFRESH_PER_MINUTE", "1")),
+)
+atexit.register(background_refresher.stop)
+
+@app.before_request
+def track_active_user():
+    # Only keeps a tracked user active; credentials are taken from verified logins alone
+    if not BACKGROUND_REFRESH:
+        return
+    username = session.get('username')
+    if username:
+        background_refresher.seen(username)
+
+# Responses above COMPRESS_MIN_BYTES are gzip (or brotli, if installed) compressed
+_compressor = ResponseCompressor(min_size=int(os.environ.get("COMPRESS_MIN_BYTES", "1024")))
+
+# Templates are part of every page version, so a deploy invalidates old ETags
+ASSET_VERSION = os.environ.get("RENDER_GIT_COMMIT") or str(max(
+    os.path.getmtime(os.path.join(app.root_path, "templates", name))
+    for name in os.listdir(os.path.join(app.root_path, "templates"))
+))
+
+@app.after_request
+def compress_response(response):
+    return _compressor.process(response, request.headers.get("Accept-Encoding"))
+
+def _versioned_page(data, render):
+    """Render a page built from `data`, or answer 304 if the browser already has this version"""
+    version = data.get("version") or data_version(data)
+    # The dashboard calendar runs up to the current month, so a new month is a new page
+    etag = make_etag(ASSET_VERSION, request.full_path, session.get('username'), version, _calendar_month())
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+# On-demand profiling: a request carrying PROFILE_TOKEN (X-Profile-Token header
+# or ?profile=<token>) is sampled, as is a PROFILE_SAMPLE_RATE fraction of all
+# requests. Profiles land in PROFILE_DIR as speedscope JSON and collapsed stacks.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000
+profile_store = ProfileStore(
+    os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "profiles")),
+    keep=int(os.environ.get("PROFILE_KEEP", "50")),
+)
+
+def _has_profile_token():
+    supplied = request.headers.get("X-Profile-Token") or request.args.get("profile", "")
+    # Bytes, since compare_digest rejects str holding non-ASCII characters
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(supplied.encode(), PROFILE_TOKEN.encode())
+
+@app.before_request
+def start_profiler():
+    if request.path.startswith("/admin/profiles"):
+        return
+    if _has_profile_token() or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+        g.profiler = SamplingProfiler(interval=PROFILE_INTERVAL).start()
+
+@app.after_request
+def finish_profiler(response):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    label = f"{request.method}-{request.path}"
+
+    def save():
+        # Runs once the body has been sent, so streamed pages are profiled to the end
+        try:
+            profile_store.save(profiler.stop(), label)
+        except Exception as e:
+            logger.error(f"Failed to save profile for {label}: {e}")
+    response.call_on_close(save)
+    return response
+
+@app.route("/admin/profiles", methods=["GET"])
+def list_profiles():
+    if not _has_profile_token():
+        return {"error": "Not found"}, 404
+    return {"profiles": [
+        {"name": p["name"], "files": sorted(p["files"]), "saved_at": datetime.fromtimestamp(p["mtime"]).isoformat()}
+        for p in profile_store.list()
+    ]}
+
+@app.route("/admin/profiles/<path:filename>", methods=["GET"])
+def download_profile(filename):
+    if not _has_profile_token():
+        return {"error": "Not found"}, 404
+    return send_from_directory(profile_store.directory, filename, as_attachment=True)
+
 @app.route("/", methods=["GET"])
 def login_page():
     return render_template("login.html")
@@ -484,86 +835,225 @@ def favicon():
     abort(204)
 
 
+def _history_calendar(username):
+    """Calendar entries from the history store, or None when it has nothing for the user"""
+    if not history_store or not username:
+        return None
+    try:
+        totals = history_store.daily_totals(username)
+    except Exception as e:
+        logger.error(f"History store read failed for {username}: {e}")
+        return None
+    if not totals:
+        return None
+    return [
+        {'date': day, 'value': 1 if present > 0 else (-1 if absent > 0 else 0)}
+        for day, present, absent in totals
+    ]
+
+def _calendar_data(data):
+    # Prefer the indexed history; fall back to the days in this scrape
+    calendar_data = _history_calendar(session.get('username'))
+    if calendar_data is None:
+        calendar_data = AttendanceIndex.from_result(data).calendar()
+    return calendar_data
+
+# Calendars are drawn server-side once per user, data version and month
+calendar_cache = CalendarCache()
+
+def _calendar_month():
+    """The last month the rendered calendar shows"""
+    return datetime.now().strftime("%Y-%m")
+
+def _calendar_svg(data):
+    """Inline SVG calendar for `data`, or None when there are no dated classes"""
+    version = data.get("version") or data_version(data)
+    key = (session.get('username'), version, _calendar_month())
+    return calendar_cache.get(key, lambda: render_calendar(_calendar_data(data)))
+
+def _attendance_goal(data):
+    """Threshold and catch-up count for the dashboard footer"""
+    threshold = _requested_threshold()
+    overall = data["overall"]
+    return {"threshold": threshold, "required": classes_needed(overall["present"], overall["absent"], threshold)}
+
+def _render_dashboard(data, notice=None):
+    """Build the calendar and subject table for dashboard.html"""
+    from tabulate import tabulate
+
+    calendar_svg = _calendar_svg(data)
+    
+    table_data = []
+    for i, (code, sub) in enumerate(data["subjects"].items(), start=1):
+        table_data.append([i, code, sub["name"], sub["present"], sub["absent"], f"{sub['percentage']}%"])
+
+    table_html = tabulate(
+        table_data,
+        headers=["S.No", "Course Code", "Course Name", "Present", "Absent", "Percentage"],
+        tablefmt="html"
+    )
+
+    return render_template("dashboard.html", data=data, calendar_svg=calendar_svg, table_html=table_html,
+                           notice=notice, goal=_attendance_goal(data))
+
+def _session_attendance():
+    """Attendance for this session, falling back to the cache (streamed logins only leave it there)"""
+    data = session.get('attendance_data')
+    if data:
+        return data
+    username = session.get('username')
+    password = session.get('password')
+    if not username or not password:
+        return None
+    # Only hand cached data to a session holding the credentials it was scraped with
+    last_known, _ = _last_known_attendance(username, password)
+    if last_known is None:
+        return None
+    return cache_get(f"att:{username}") or last_known
+
+def _remember_attendance(username, password, data):
+    try:
+        _store_attendance(username, password, data)
+        logger.info(f"Cached attendance data for user: {username}")
+        if BACKGROUND_REFRESH:
+            background_refresher.touch(username, password, refreshed_at=time.time())
+    except Exception:
+        pass
+
+# Stream the dashboard while the scrape runs instead of answering after it
+STREAM_DASHBOARD = os.environ.get("STREAM_DASHBOARD", "0") == "1"
+
+def _dashboard_events(username, password):
+    """Yield each course as the scrape parses it, then the finished (or failed) result"""
+    updates = queue.Queue()
+    outcome = {}
+
+    def run():
+        try:
+            outcome["data"] = get_attendance_data(
+                username, password, on_course=lambda code, sub: updates.put((code, dict(sub)))
+            )
+        except Exception as e:
+            outcome["data"] = {"error": f"System error: {str(e)}"}
+        finally:
+            updates.put(None)
+
+    # A plain thread: the scrape executor also runs hedged attempts and must not fill up with waiters
+    threading.Thread(target=run, name="dashboard-stream", daemon=True).start()
+
+    streamed = set()
+    while True:
+        item = updates.get()
+        if item is None:
+            break
+        code, sub = item
+        # Hedged attempts can both report a course
+        if code not in streamed:
+            streamed.add(code)
+            yield {"kind": "course", "code": code, "sub": sub}
+
+    data = outcome["data"]
+    notice = None
+    if data.get("portal_down"):
+        stale, fetched_at = _last_known_attendance(username, password)
+        if stale:
+            data = stale
+            notice = f"The college portal is not responding. Showing attendance as of {fetched_at}."
+    if "error" in data:
+        yield {"kind": "error", "message": data["error"]}
+        return
+    if notice is None:
+        _remember_attendance(username, password, data)
+
+    # Results that bypassed the row parser (async engine, stale copy) arrive all at once
+    for code, sub in data["subjects"].items():
+        if code not in streamed:
+            yield {"kind": "course", "code": code, "sub": sub}
+    yield {
+        "kind": "done",
+        "data": data,
+        "calendar_svg": _calendar_svg(data),
+        "notice": notice,
+        "goal": _attendance_goal(data),
+        "login_ticket": _issue_login_ticket(username, password),
+    }
+
+def _issue_login_ticket(username, password):
+    """One-time nonce the finished page exchanges for the session this login proved"""
+    nonce = secrets.token_urlsafe(32)
+    cache_set(f"stream_login:{nonce}", {"username": username, "password": password}, ttl_seconds=300)
+    return nonce
+
+def _stream_dashboard(username, password):
+    from flask import stream_template
+
+    # Headers (and so the session cookie) go out before the scrape has checked the
+    # password; the finished page claims the session with a login ticket instead
+    last_known, last_known_at = _last_known_attendance(username, password)
+    response = app.response_class(stream_template(
+        "dashboard_stream.html",
+        events=_dashboard_events(username, password),
+        last_known=last_known,
+        last_known_at=last_known_at,
+    ), mimetype="text/html")
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route("/dashboard/session", methods=["POST"])
+def claim_stream_login():
+    """Start the session for a streamed login once its scrape has succeeded"""
+    pending = cache_pop(f"stream_login:{request.form.get('ticket', '')}")
+    if not pending:
+        return "", 403
+    session['username'] = pending["username"]
+    session['password'] = pending["password"]
+    session.pop('attendance_data', None)
+    return "", 204
+
 @app.route("/dashboard", methods=["GET", "POST"])
 def dashboard():
     if request.method == "GET":
         # Handle GET requests (navigation from other pages)
-        data = session.get('attendance_data')
-        if not data:
-            username = session.get('username')
-            if username:
-                cached = cache_get(f"att:{username}")
-                if cached:
-                    data = cached
+        data = _session_attendance()
         if not data:
             return redirect("/")
         
-        calendar_data = []
-        date_attendance = data.get('date_attendance', {})
-        
-        for date_key in date_attendance:
-            try:
-                dt = datetime.strptime(date_key, "%d-%m-%Y")
-                # 1 = present, -1 = absent, 0 = holiday (no record)
-                present_cnt = date_attendance[date_key]['present']
-                absent_cnt = date_attendance[date_key]['absent']
-                value = 1 if present_cnt > 0 else (-1 if absent_cnt > 0 else 0)
-                calendar_data.append({'date': dt.strftime("%Y-%m-%d"), 'value': value})
-            except ValueError:
-                continue
-        
-        table_data = []
-        for i, (code, sub) in enumerate(data["subjects"].items(), start=1):
-            table_data.append([i, code, sub["name"], sub["present"], sub["absent"], f"{sub['percentage']}%"])
-
-        table_html = tabulate(
-            table_data,
-            headers=["S.No", "Course Code", "Course Name", "Present", "Absent", "Percentage"],
-            tablefmt="html"
-        )
-        
-        return render_template("dashboard.html", data=data, calendar_data=calendar_data, table_html=table_html)
+        return _versioned_page(data, lambda: _render_dashboard(data))
     
     # Handle POST requests (login)
     username = request.form["username"]
     password = request.form["password"]
 
-    # Check cache first
+    # Check cache first; only credentials that produced it may read it
     cached_data = cache_get(f"att:{username}")
-    if cached_data:
+    last_known, fetched_at = _last_known_attendance(username, password) if cached_data else (None, None)
+    if last_known is not None:
         logger.info(f"Using cached data for user: {username}")
         session['attendance_data'] = cached_data
         session['username'] = username
         session['password'] = password
+        if BACKGROUND_REFRESH:
+            # Age the new tracking entry by the cache's, so a fresh entry is not scraped again
+            background_refresher.touch(username, password, refreshed_at=_fetched_timestamp(fetched_at))
         
-        calendar_data = []
-        date_attendance = cached_data.get('date_attendance', {})
-        
-        for date_key in date_attendance:
-            try:
-                dt = datetime.strptime(date_key, "%d-%m-%Y")
-                present_cnt = date_attendance[date_key]['present']
-                absent_cnt = date_attendance[date_key]['absent']
-                value = 1 if present_cnt > 0 else (-1 if absent_cnt > 0 else 0)
-                calendar_data.append({'date': dt.strftime("%Y-%m-%d"), 'value': value})
-            except ValueError:
-                continue
-        
-        table_data = []
-        for i, (code, sub) in enumerate(cached_data["subjects"].items(), start=1):
-            table_data.append([i, code, sub["name"], sub["present"], sub["absent"], f"{sub['percentage']}%"])
-
-        table_html = tabulate(
-            table_data,
-            headers=["S.No", "Course Code", "Course Name", "Present", "Absent", "Percentage"],
-            tablefmt="html"
-        )
+        return _render_dashboard(cached_data)
 
-        return render_template("dashboard.html", data=cached_data, calendar_data=calendar_data, table_html=table_html)
+    if STREAM_DASHBOARD:
+        return _stream_dashboard(username, password)
 
     # Scrape fresh data
     data = get_attendance_data(username, password)
 
+    if data.get("portal_down"):
+        # Serve the last known figures rather than failing while the portal recovers
+        stale, fetched_at = _last_known_attendance(username, password)
+        if stale:
+            session['attendance_data'] = stale
+            session['username'] = username
+            session['password'] = password
+            notice = f"The college portal is not responding. Showing attendance as of {fetched_at}."
+            return _render_dashboard(stale, notice=notice)
+
     if "error" in data:
         return render_template("login.html", error=data["error"])
 
@@ -571,82 +1061,117 @@ def dashboard():
     session['username'] = username
     session['password'] = password
 
+    _remember_attendance(username, password, data)
+
+    return _render_dashboard(data)
+
+def _read_lab_subjects(driver):
+    """Read the lab subject dropdown on the lab record page"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import Select
+
+    lab_select_element = driver.find_element(By.CSS_SELECTOR, "select")
+    lab_select = Select(lab_select_element)
+    lab_options = []
+    for option in lab_select.options:
+        value = option.get_attribute('value')
+        text = option.text
+        if value and value.strip() and "select" not in text.lower():
+            lab_options.append({
+                'value': value,
+                'text': text
+            })
+    return lab_options
+
+def _read_lab_experiments(driver, lab_code):
+    """Select a lab and read every row of its experiment table"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import Select
+
+    # Select the lab from first dropdown
+    lab_select_element = driver.find_element(By.CSS_SELECTOR, "select")
+    lab_select = Select(lab_select_element)
+    lab_select.select_by_value(lab_code)
+    time.sleep(2)
+
+    experiments = []
     try:
-        cache_set(f"att:{username}", data, ttl_seconds=1800)
-        logger.info(f"Cached attendance data for user: {username}")
-    except Exception:
-        pass
-
-    calendar_data = []
-    date_attendance = data.get('date_attendance', {})
-    
-    for date_key in date_attendance:
+        # Look for table rows containing experiment data
+        rows = driver.find_elements(By.CSS_SELECTOR, "table tr")
+        for row in rows:
+            cells = row.find_elements(By.TAG_NAME, "td")
+            if len(cells) >= 5:  # Week#, Subject Code, Experiment Title, Batch No, Experiment Submission Date
+                week_text = cells[0].text.strip()
+                experiment_title = cells[2].text.strip()
+                submission_date = cells[4].text.strip()
+
+                # Extract week number from week text (e.g., "Week-1" -> "1")
+                week_match = re.search(r'Week-?(\d+)', week_text, re.IGNORECASE)
+                if week_match and experiment_title and submission_date:
+                    experiments.append({
+                        'week_number': week_match.group(1),
+                        'week_text': week_text,
+                        'subject_code': cells[1].text.strip(),
+                        'experiment_title': experiment_title,
+                        'batch_no': cells[3].text.strip(),
+                        'submission_date': submission_date,
+                    })
+    except Exception as e:
+        logger.error(f"Error parsing lab dates: {e}")
+    return experiments
+
+def _available_lab_dates(experiments):
+    """Experiments whose submission date is today or later"""
+    lab_dates = []
+    current_date = datetime.now()
+    for experiment in experiments:
+        # Parse submission date to check if it's still open for upload
+        is_available = True
         try:
-            dt = datetime.strptime(date_key, "%d-%m-%Y")
-            present_cnt = date_attendance[date_key]['present']
-            absent_cnt = date_attendance[date_key]['absent']
-            value = 1 if present_cnt > 0 else (-1 if absent_cnt > 0 else 0)
-            calendar_data.append({'date': dt.strftime("%Y-%m-%d"), 'value': value})
+            # Parse date in DD-MM-YYYY format
+            if '-' in experiment['submission_date']:
+                submission_dt = datetime.strptime(experiment['submission_date'], "%d-%m-%Y")
+                # Only show dates that are today or in the future
+                is_available = submission_dt.date() >= current_date.date()
         except ValueError:
-            continue
-    
-    table_data = []
-    for i, (code, sub) in enumerate(data["subjects"].items(), start=1):
-        table_data.append([i, code, sub["name"], sub["present"], sub["absent"], f"{sub['percentage']}%"])
-
-    table_html = tabulate(
-        table_data,
-        headers=["S.No", "Course Code", "Course Name", "Present", "Absent", "Percentage"],
-        tablefmt="html"
-    )
-
-    return render_template("dashboard.html", data=data, calendar_data=calendar_data, table_html=table_html)
+            # If date parsing fails, assume it's available
+            is_available = True
+        if is_available:
+            lab_dates.append(dict(experiment, is_available=True))
+    return lab_dates
+
+def _cached_lab_index(username, password):
+    """Prefetched lab index for these credentials; entries saved under another password are misses"""
+    entry = cache_get(f"lab:{username}")
+    if not entry or not hmac.compare_digest(entry.get("auth", ""), _credential_digest(username, password)):
+        return {}
+    return entry
 
 def get_lab_subjects(username, password):
     """Fetch lab subjects from the website"""
+    cached = _cached_lab_index(username, password).get("subjects")
+    if cached is not None:
+        return cached
+
+    if not portal_health.allow_request():
+        logger.warning("Portal circuit open, skipping lab subjects lookup")
+        return []
+
     driver = None
 
     try:
-        driver = driver_pool.get_driver(timeout=30)
-        # Login
-        driver.get(COLLEGE_LOGIN_URL)
-        time.sleep(2)
-        try:
-            driver.find_element(By.ID, "txt_uname").send_keys(username)
-            driver.find_element(By.ID, "txt_pwd").send_keys(password)
-            driver.find_element(By.ID, "but_submit").click()
-        except Exception:
-            # Fallback: Try generic input selection
-            inputs = driver.find_elements(By.TAG_NAME, "input")
-            if len(inputs) >= 2:
-                inputs[0].send_keys(username)
-                inputs[1].send_keys(password)
-                try:
-                    driver.find_element(By.ID, "but_submit").click()
-                except:
-                    driver.find_element(By.CSS_SELECTOR, "input[type='submit']").click()
-            else:
-                raise Exception("Could not find login input fields")
-        time.sleep(3)
+        driver = driver_pool.get_driver(timeout=30, work_class=LAB_METADATA)
+        if not _portal_login(driver, username, password):
+            logger.warning(f"Login failed for user: {username}")
+            return []
 
         # Navigate to lab record page
-        driver.get("https://samvidha.iare.ac.in/home?action=labrecord_std")
+        driver.get(LAB_RECORD_URL)
         time.sleep(3)
 
         # Find the first select dropdown (Subject dropdown)
         try:
-            lab_select_element = driver.find_element(By.CSS_SELECTOR, "select")
-            lab_select = Select(lab_select_element)
-            lab_options = []
-            for option in lab_select.options:
-                value = option.get_attribute('value')
-                text = option.text
-                if value and value.strip() and "select" not in text.lower():
-                    lab_options.append({
-                        'value': value,
-                        'text': text
-                    })
-            return lab_options
+            return _read_lab_subjects(driver)
         except Exception as e:
             logger.error(f"Error finding lab dropdown: {e}")
             return []
@@ -660,83 +1185,28 @@ def get_lab_subjects(username, password):
 
 def get_lab_dates(username, password, lab_code):
     """Fetch available lab dates and experiment details for a specific lab"""
+    cached = _cached_lab_index(username, password).get("experiments", {}).get(lab_code)
+    if cached is not None:
+        return _available_lab_dates(cached)
+
+    if not portal_health.allow_request():
+        logger.warning("Portal circuit open, skipping lab dates lookup")
+        return []
+
     driver = None
 
     try:
-        driver = driver_pool.get_driver(timeout=30)
-        # Login
-        driver.get(COLLEGE_LOGIN_URL)
-        time.sleep(2)
-        try:
-            driver.find_element(By.ID, "txt_uname").send_keys(username)
-            driver.find_element(By.ID, "txt_pwd").send_keys(password)
-            driver.find_element(By.ID, "but_submit").click()
-        except Exception:
-            inputs = driver.find_elements(By.TAG_NAME, "input")
-            if len(inputs) >= 2:
-                inputs[0].send_keys(username)
-                inputs[1].send_keys(password)
-                try:
-                    driver.find_element(By.ID, "but_submit").click()
-                except:
-                    driver.find_element(By.CSS_SELECTOR, "input[type='submit']").click()
-        time.sleep(3)
+        driver = driver_pool.get_driver(timeout=30, work_class=LAB_METADATA)
+        if not _portal_login(driver, username, password):
+            logger.warning(f"Login failed for user: {username}")
+            return []
 
         # Navigate to lab record page
-        driver.get("https://samvidha.iare.ac.in/home?action=labrecord_std")
+        driver.get(LAB_RECORD_URL)
         time.sleep(3)
 
-        # Select the lab from first dropdown
-        lab_select_element = driver.find_element(By.CSS_SELECTOR, "select")
-        lab_select = Select(lab_select_element)
-        lab_select.select_by_value(lab_code)
-        time.sleep(2)
-
         # Parse the experiment details table and filter for available dates
-        lab_dates = []
-        current_date = datetime.now()
-        
-        try:
-            # Look for table rows containing experiment data
-            rows = driver.find_elements(By.CSS_SELECTOR, "table tr")
-            for row in rows:
-                cells = row.find_elements(By.TAG_NAME, "td")
-                if len(cells) >= 5:  # Week#, Subject Code, Experiment Title, Batch No, Experiment Submission Date
-                    week_text = cells[0].text.strip()
-                    subject_code = cells[1].text.strip()
-                    experiment_title = cells[2].text.strip()
-                    batch_no = cells[3].text.strip()
-                    submission_date = cells[4].text.strip()
-                    
-                    # Parse submission date to check if it's still open for upload
-                    is_available = True
-                    try:
-                        # Parse date in DD-MM-YYYY format
-                        if submission_date and '-' in submission_date:
-                            submission_dt = datetime.strptime(submission_date, "%d-%m-%Y")
-                            # Only show dates that are today or in the future
-                            is_available = submission_dt.date() >= current_date.date()
-                    except ValueError:
-                        # If date parsing fails, assume it's available
-                        is_available = True
-                    
-                    # Extract week number from week text (e.g., "Week-1" -> "1")
-                    week_match = re.search(r'Week-?(\d+)', week_text, re.IGNORECASE)
-                    if week_match and experiment_title and submission_date and is_available:
-                        week_number = week_match.group(1)
-                        lab_dates.append({
-                            'week_number': week_number,
-                            'week_text': week_text,
-                            'subject_code': subject_code,
-                            'experiment_title': experiment_title,
-                            'batch_no': batch_no,
-                            'submission_date': submission_date,
-                            'is_available': is_available
-                        })
-        except Exception as e:
-            logger.error(f"Error parsing lab dates: {e}")
-
-        return lab_dates
+        return _available_lab_dates(_read_lab_experiments(driver, lab_code))
 
     except Exception as e:
         logger.error(f"Error fetching lab dates: {e}")
@@ -747,30 +1217,29 @@ def get_lab_dates(username, password, lab_code):
 
 def get_experiment_title(username, password, lab_code, week_number):
     """Get experiment title for a specific lab and week"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import Select
+
+    cached = _cached_lab_index(username, password).get("experiments", {}).get(lab_code)
+    if cached is not None:
+        for experiment in cached:
+            if experiment['week_number'] == str(week_number):
+                return experiment['experiment_title']
+
+    if not portal_health.allow_request():
+        logger.warning("Portal circuit open, skipping experiment title lookup")
+        return ""
+
     driver = None
 
     try:
-        driver = driver_pool.get_driver(timeout=30)
-        # Login
-        driver.get(COLLEGE_LOGIN_URL)
-        time.sleep(2)
-        try:
-            driver.find_element(By.ID, "txt_uname").send_keys(username)
-            driver.find_element(By.ID, "txt_pwd").send_keys(password)
-            driver.find_element(By.ID, "but_submit").click()
-        except Exception:
-            inputs = driver.find_elements(By.TAG_NAME, "input")
-            if len(inputs) >= 2:
-                inputs[0].send_keys(username)
-                inputs[1].send_keys(password)
-                try:
-                    driver.find_element(By.ID, "but_submit").click()
-                except:
-                    driver.find_element(By.CSS_SELECTOR, "input[type='submit']").click()
-        time.sleep(3)
+        driver = driver_pool.get_driver(timeout=30, work_class=LAB_METADATA)
+        if not _portal_login(driver, username, password):
+            logger.warning(f"Login failed for user: {username}")
+            return ""
 
         # Navigate to lab record page
-        driver.get("https://samvidha.iare.ac.in/home?action=labrecord_std")
+        driver.get(LAB_RECORD_URL)
         time.sleep(3)
 
         # Select the lab from first dropdown
@@ -804,31 +1273,82 @@ def get_experiment_title(username, password, lab_code, week_number):
         if driver:
             driver_pool.return_driver(driver)
 
-def compress_images_to_pdf(image_files, max_size_mb=1):
-    """Convert and compress images to PDF under specified size"""
-    pdf_buffer = io.BytesIO()
-    c = canvas.Canvas(pdf_buffer, pagesize=A4)
+def _ensure_md5_compat():
+    """ReportLab calls hashlib.md5(usedforsecurity=False), which some OpenSSL builds reject"""
+    try:
+        hashlib.md5(usedforsecurity=False)
+    except TypeError:
+        original_md5 = hashlib.md5
+        def _md5_patch(*args, **kwargs):
+            return original_md5(*args)
+        hashlib.md5 = _md5_patch
+
+def _is_embeddable_jpeg(img):
+    """Baseline RGB JPEG that ReportLab can copy into the PDF without decoding it"""
+    return (img.format == 'JPEG' and img.mode == 'RGB'
+            and not img.info.get('progressive') and not img.info.get('progression'))
+
+def _draw_jpeg_as_is(c, image_file, img_width, img_height, width, height):
+    """Draw a JPEG at one pixel per point; its bytes go into the PDF untouched"""
+    if isinstance(image_file, str) and image_file.lower().endswith(('.jpg', '.jpeg')):
+        path, temp_img_path = image_file, None
+    else:
+        # ReportLab passes JPEG bytes through only when given a .jpg filename
+        if hasattr(image_file, 'seek'):
+            image_file.seek(0)
+            data = image_file.read()
+        else:
+            with open(image_file, 'rb') as f:
+                data = f.read()
+        path = temp_img_path = tempfile.mktemp(suffix='.jpg')
+        with open(temp_img_path, 'wb') as f:
+            f.write(data)
+    try:
+        c.drawImage(path, (width - img_width) / 2, (height - img_height) / 2, width=img_width, height=img_height)
+        c.showPage()
+    finally:
+        if temp_img_path:
+            os.remove(temp_img_path)
+
+def _draw_images_to_pdf(image_files, target, max_scale, quality):
+    """Render one A4 page per image into `target` (a path or file object)"""
+    from PIL import Image
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from reportlab import rl_config
+    _ensure_md5_compat()
+    # Store image streams as binary rather than ASCII85 text, which is 25% larger
+    rl_config.useA85 = 0
+
+    c = canvas.Canvas(target, pagesize=A4)
     width, height = A4
 
     for image_file in image_files:
         try:
+            if hasattr(image_file, 'seek'):
+                image_file.seek(0)
             img = Image.open(image_file)
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
 
             # Calculate scaling to fit page
             img_width, img_height = img.size
             scale_w = (width - 40) / img_width
             scale_h = (height - 40) / img_height
-            scale = min(scale_w, scale_h, 1.0)
+            scale = min(scale_w, scale_h, max_scale)
 
+            if scale >= 1 and _is_embeddable_jpeg(img):
+                # Already page-sized (the lab form resizes in the browser): embed as is
+                _draw_jpeg_as_is(c, image_file, img_width, img_height, width, height)
+                continue
+
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
             new_width = int(img_width * scale)
             new_height = int(img_height * scale)
             img = img.resize((new_width, new_height), Image.LANCZOS)
 
             # Save to a temporary file for ReportLab
             temp_img_path = tempfile.mktemp(suffix='.jpg')
-            img.save(temp_img_path, format='JPEG', quality=85, optimize=True)
+            img.save(temp_img_path, format='JPEG', quality=quality, optimize=True)
 
             x = (width - new_width) / 2
             y = (height - new_height) / 2
@@ -838,171 +1358,282 @@ def compress_images_to_pdf(image_files, max_size_mb=1):
             # Clean up temp image
             os.remove(temp_img_path)
         except Exception as e:
-            print(f"Error processing image: {e}")
+            logger.error(f"Error processing image: {e}")
             continue
 
     c.save()
-    pdf_buffer.seek(0)
 
-    # Check size and compress if needed
-    pdf_size = len(pdf_buffer.getvalue())
+def compress_images_to_pdf(image_files, max_size_mb=1, output_path=None):
+    """Convert and compress images to PDF under specified size.
+
+    Returns a BytesIO, or writes straight to `output_path` and returns the path.
+    """
     max_size_bytes = max_size_mb * 1024 * 1024
 
-    if pdf_size > max_size_bytes:
+    if output_path:
+        _draw_images_to_pdf(image_files, output_path, 1.0, 85)
+        if os.path.getsize(output_path) > max_size_bytes:
+            # Reduce quality and try again
+            _draw_images_to_pdf(image_files, output_path, 0.8, 60)
+        return output_path
+
+    pdf_buffer = io.BytesIO()
+    _draw_images_to_pdf(image_files, pdf_buffer, 1.0, 85)
+
+    # Check size and compress if needed
+    if pdf_buffer.tell() > max_size_bytes:
         # Reduce quality and try again
         pdf_buffer = io.BytesIO()
-        c = canvas.Canvas(pdf_buffer, pagesize=A4)
-        for image_file in image_files:
-            try:
-                img = Image.open(image_file)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                img_width, img_height = img.size
-                scale_w = (width - 40) / img_width
-                scale_h = (height - 40) / img_height
-                scale = min(scale_w, scale_h, 0.8)
-                new_width = int(img_width * scale)
-                new_height = int(img_height * scale)
-                img = img.resize((new_width, new_height), Image.LANCZOS)
-                temp_img_path = tempfile.mktemp(suffix='.jpg')
-                img.save(temp_img_path, format='JPEG', quality=60, optimize=True)
-                x = (width - new_width) / 2
-                y = (height - new_height) / 2
-                c.drawImage(temp_img_path, x, y, width=new_width, height=new_height)
-                c.showPage()
-                os.remove(temp_img_path)
-            except Exception as e:
-                continue
-        c.save()
-        pdf_buffer.seek(0)
+        _draw_images_to_pdf(image_files, pdf_buffer, 0.8, 60)
 
+    pdf_buffer.seek(0)
     return pdf_buffer
 
-def upload_lab_record(username, password, lab_code, week_no, title, pdf_file):
-    driver = None
+def _open_lab_form(driver):
+    """Load the lab record page and wait for the subject dropdown to be populated"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
 
+    driver.get(LAB_RECORD_URL)
     try:
-        driver = driver_pool.get_driver(timeout=30)
-        # Login
-        driver.get(COLLEGE_LOGIN_URL)
-        time.sleep(2)
+        WebDriverWait(driver, 10, poll_frequency=0.25).until(
+            lambda d: len(d.find_elements(By.CSS_SELECTOR, "#sub_code option")) > 1
+        )
+    except TimeoutException:
+        # Let the form fill report what is actually missing
+        pass
 
-        try:
-            driver.find_element(By.ID, "txt_uname").send_keys(username)
-            driver.find_element(By.ID, "txt_pwd").send_keys(password)
-            driver.find_element(By.ID, "but_submit").click()
-        except Exception:
-            inputs = driver.find_elements(By.TAG_NAME, "input")
-            if len(inputs) >= 2:
-                inputs[0].send_keys(username)
-                inputs[1].send_keys(password)
-                try:
-                    driver.find_element(By.ID, "but_submit").click()
-                except:
-                    driver.find_element(By.CSS_SELECTOR, "input[type='submit']").click()
-            else:
-                raise Exception("Could not find login input fields")
+def _fill_lab_form(driver, lab_code, week_no, title):
+    """Select the lab and week and type the experiment title"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import Select
+
+    # Use specific IDs for form fields
+    lab_select_element = driver.find_element(By.ID, "sub_code")
+    driver.execute_script("arguments[0].scrollIntoView(true);", lab_select_element)
+    lab_select = Select(lab_select_element)
+    lab_select.select_by_value(lab_code)
+
+    week_select_element = driver.find_element(By.ID, "week_no")
+    driver.execute_script("arguments[0].scrollIntoView(true);", week_select_element)
+    week_select = Select(week_select_element)
+
+    # Ensure week_value matches the actual option value
+    week_value = None
+    available_values = [opt.get_attribute('value') for opt in week_select.options]
+    match = re.search(r'Week-?(\d+)', str(week_no))
+    if match:
+        possible_value = match.group(0)
+        possible_number = match.group(1)
+        # Try full "Week-7" first
+        if possible_value in available_values:
+            week_value = possible_value
+        # Try just "7"
+        elif possible_number in available_values:
+            week_value = possible_number
+        else:
+            # fallback: use first available value
+            week_value = available_values[0]
+    else:
+        week_value = available_values[0]
+    logger.info(f"Selecting week value: {week_value}")
+    week_select.select_by_value(week_value)
+
+    title_field = driver.find_element(By.ID, "exp_title")
+    driver.execute_script("arguments[0].scrollIntoView(true);", title_field)
+    title_field.clear()
+    title_field.send_keys(title)
+
+    # Assert that the title field is correctly set
+    assert title_field.get_attribute("value") == title
+
+def _submit_lab_form(driver, pdf_path):
+    """Attach the PDF, submit the filled form and interpret the portal's reply"""
+    from selenium.webdriver.common.by import By
+
+    file_input = driver.find_element(By.ID, "prog_doc")
+    driver.execute_script("arguments[0].scrollIntoView(true);", file_input)
+    file_input.send_keys(pdf_path)
+
+    time.sleep(2)
+
+    submit_button = driver.find_element(By.ID, "LAB_OK")
+    driver.execute_script("arguments[0].scrollIntoView(true);", submit_button)
+    submit_button.click()
+
+    time.sleep(3)
+
+    page_source = driver.page_source.lower()
+    if "success" in page_source or "uploaded" in page_source:
+        return {"success": True, "message": "Lab record uploaded successfully!"}
+    elif "error" in page_source or "failed" in page_source:
+        return {"success": False, "message": "Upload failed. Please check your inputs and try again."}
+    else:
+        return {"success": True, "message": "Upload completed. Please verify on the website."}
+
+def _resolve_pdf(pdf_file):
+    """Return (path, is_temporary) for a PDF given as a path, a BytesIO or a pending Future"""
+    if hasattr(pdf_file, "result"):
+        # Conversion ran alongside the login; this is where the two meet
+        return pdf_file.result(timeout=120), False
+    if isinstance(pdf_file, str):
+        return pdf_file, False
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
+        temp_file.write(pdf_file.getvalue())
+        return temp_file.name, True
+
+def submission_deadline(submission_date):
+    """Unix time at the end of a lab's DD-MM-YYYY submission date, or None"""
+    try:
+        day = datetime.strptime(submission_date or "", "%d-%m-%Y")
+    except ValueError:
+        return None
+    return day.replace(hour=23, minute=59, second=59).timestamp()
 
-        time.sleep(3)
+def upload_lab_record(username, password, lab_code, week_no, title, pdf_file, deadline=None):
+    """Upload one lab record. `pdf_file` may still be rendering (a Future of its path).
 
-        # Navigate to lab record page
-        driver.get("https://samvidha.iare.ac.in/home?action=labrecord_std")
-        time.sleep(5)
+    `deadline` (unix time) lets the driver scheduler put closing submissions first.
+    """
+    if not portal_health.allow_request():
+        logger.warning("Portal circuit open, skipping lab record upload")
+        return {"success": False, "message": PORTAL_DOWN_MESSAGE}
 
-        # Use specific IDs for form fields
-        lab_select_element = driver.find_element(By.ID, "sub_code")
-        driver.execute_script("arguments[0].scrollIntoView(true);", lab_select_element)
-        lab_select = Select(lab_select_element)
-        lab_select.select_by_value(lab_code)
+    driver = None
+    temp_file_path = None
 
-        week_select_element = driver.find_element(By.ID, "week_no")
-        driver.execute_script("arguments[0].scrollIntoView(true);", week_select_element)
-        week_select = Select(week_select_element)
-
-        # Ensure week_value matches the actual option value
-        week_value = None
-        available_values = [opt.get_attribute('value') for opt in week_select.options]
-        match = re.search(r'Week-?(\d+)', str(week_no))
-        if match:
-            possible_value = match.group(0)
-            possible_number = match.group(1)
-            # Try full "Week-7" first
-            if possible_value in available_values:
-                week_value = possible_value
-            # Try just "7"
-            elif possible_number in available_values:
-                week_value = possible_number
-            else:
-                # fallback: use first available value
-                week_value = available_values[0]
-        else:
-            week_value = available_values[0]
-        logger.info(f"Selecting week value: {week_value}")
-        week_select.select_by_value(week_value)
+    try:
+        driver = driver_pool.get_driver(timeout=30, work_class=UPLOAD, deadline=deadline)
+        if not _portal_login(driver, username, password):
+            logger.warning(f"Login failed for user: {username}")
+            return {"success": False, "message": "Invalid username or password."}
 
-        title_field = driver.find_element(By.ID, "exp_title")
-        driver.execute_script("arguments[0].scrollIntoView(true);", title_field)
-        title_field.clear()
-        title_field.send_keys(title)
+        _open_lab_form(driver)
+        _fill_lab_form(driver, lab_code, week_no, title)
 
-        # Assert that the title field is correctly set
-        assert title_field.get_attribute("value") == title
+        pdf_path, is_temp = _resolve_pdf(pdf_file)
+        if is_temp:
+            temp_file_path = pdf_path
+        return _submit_lab_form(driver, pdf_path)
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            temp_file.write(pdf_file.getvalue())
-            temp_file_path = temp_file.name
+    except Exception as e:
+        return {"success": False, "message": f"Error uploading lab record: {str(e)}"}
+    finally:
+        if temp_file_path:
+            os.unlink(temp_file_path)
+        if driver:
+            driver_pool.return_driver(driver)
 
-        file_input = driver.find_element(By.ID, "prog_doc")
-        driver.execute_script("arguments[0].scrollIntoView(true);", file_input)
-        file_input.send_keys(temp_file_path)
+def upload_lab_records_batch(username, password, items):
+    """Upload several lab records in one portal session.
 
-        time.sleep(2)
+    `items` are dicts with lab_code, week_no, title, pdf (as accepted by
+    upload_lab_record) and an optional deadline. Returns one result dict per
+    item, in order.
+    """
+    if not portal_health.allow_request():
+        logger.warning("Portal circuit open, skipping batch lab upload")
+        return [{"success": False, "message": PORTAL_DOWN_MESSAGE} for _ in items]
 
-        submit_button = driver.find_element(By.ID, "LAB_OK")
-        driver.execute_script("arguments[0].scrollIntoView(true);", submit_button)
-        submit_button.click()
+    driver = None
+    results = []
+    deadlines = [item["deadline"] for item in items if item.get("deadline")]
+    deadline = min(deadlines) if deadlines else None
 
-        time.sleep(3)
-        os.unlink(temp_file_path)
-  
-        page_source = driver.page_source.lower()
-        if "success" in page_source or "uploaded" in page_source:
-            return {"success": True, "message": "Lab record uploaded successfully!"}
-        elif "error" in page_source or "failed" in page_source:
-            return {"success": False, "message": "Upload failed. Please check your inputs and try again."}
-        else:
-            return {"success": True, "message": "Upload completed. Please verify on the website."}
+    try:
+        driver = driver_pool.get_driver(timeout=30, work_class=UPLOAD, deadline=deadline)
+        if not _portal_login(driver, username, password):
+            logger.warning(f"Login failed for user: {username}")
+            return [{"success": False, "message": "Invalid username or password."} for _ in items]
+
+        for item in items:
+            temp_file_path = None
+            try:
+                # Reloading the page resets sub_code/week_no after the previous submission
+                _open_lab_form(driver)
+                _fill_lab_form(driver, item["lab_code"], item["week_no"], item["title"])
+                pdf_path, is_temp = _resolve_pdf(item["pdf"])
+                if is_temp:
+                    temp_file_path = pdf_path
+                result = _submit_lab_form(driver, pdf_path)
+            except Exception as e:
+                result = {"success": False, "message": f"Error uploading lab record: {str(e)}"}
+            finally:
+                if temp_file_path:
+                    os.unlink(temp_file_path)
+            logger.info(f"Batch upload {item['lab_code']} {item['week_no']} for {username}: {result['message']}")
+            results.append(result)
 
     except Exception as e:
-        return {"success": False, "message": f"Error uploading lab record: {str(e)}"}
+        message = f"Error uploading lab record: {str(e)}"
+        results.extend({"success": False, "message": message} for _ in items[len(results):])
     finally:
         if driver:
             driver_pool.return_driver(driver)
 
+    return results
+
+# What-if tables cover k = 0..PROJECTION_MAX_K so the pages never round-trip for a scenario
+ATTENDANCE_THRESHOLD = float(os.environ.get("ATTENDANCE_THRESHOLD", "75"))
+PROJECTION_MAX_K = 50
+
+def _requested_threshold():
+    threshold = request.args.get('threshold', ATTENDANCE_THRESHOLD, type=float)
+    return threshold if 0 < threshold <= 100 else ATTENDANCE_THRESHOLD
+
 @app.route("/b_safe", methods=["GET"])
 def b_safe():
-    data = session.get('attendance_data')   
+    data = _session_attendance()
     if not data:
         return redirect("/")
-    bunk = request.args.get('bunk', 0, type=int)
-    total = data["overall"]["present"] + data["overall"]["absent"] + bunk
-    projected = round((data["overall"]["present"] / total * 100) if total > 0 else 0, 2)
-    return render_template("b_safe.html", data=data, bunk=bunk, projected=projected)
+    bunk = min(max(request.args.get('bunk', 0, type=int), 0), PROJECTION_MAX_K)
+    return _versioned_page(data, lambda: render_template(
+        "b_safe.html", data=data, bunk=bunk,
+        projection=build_projection(data, max_k=PROJECTION_MAX_K, threshold=_requested_threshold()),
+    ))
 
 @app.route("/course/<code>", methods=["GET"])
 def course(code):
-    data = session.get('attendance_data')
+    data = _session_attendance()
     if not data or code not in data['subjects']:
         return redirect("/dashboard")
+    return _versioned_page(data, lambda: _render_course(data, code))
+
+def _weekly_trend(data, code):
+    """Present/absent totals and percentage per Monday-aligned week, from the stored day index"""
+    trend = []
+    for monday, present, absent in AttendanceIndex.from_result(data).weekly(code):
+        total = present + absent
+        trend.append({
+            "start": monday.isoformat(),
+            "present": present,
+            "absent": absent,
+            "percentage": round(present / total * 100, 2) if total else 0.0,
+        })
+    return trend
+
+def _render_course(data, code):
     sub = data['subjects'][code]
-    bunk = request.args.get('bunk', 0, type=int)
-    total = sub["present"] + sub["absent"] + bunk
-    projected = round((sub["present"] / total * 100) if total > 0 else 0, 2)
-    return render_template("course.html", sub=sub, code=code, bunk=bunk, projected=projected)
+    bunk = min(max(request.args.get('bunk', 0, type=int), 0), PROJECTION_MAX_K)
+    threshold = _requested_threshold()
+    projection = dict(project(sub["present"], sub["absent"], PROJECTION_MAX_K, threshold),
+                      threshold=threshold, max_k=PROJECTION_MAX_K)
+
+    weekly = _weekly_trend(data, code)
+    recent_days = []
+    username = session.get('username')
+    if history_store and username:
+        try:
+            recent_days = history_store.course_history(username, code)[-10:][::-1]
+        except Exception as e:
+            logger.error(f"History store read failed for {username}: {e}")
+    return render_template("course.html", sub=sub, code=code, bunk=bunk, projection=projection,
+                           weekly=weekly, recent_days=recent_days)
 
 @app.route("/lab", methods=["GET", "POST"])
 def lab():
-    data = session.get('attendance_data')
+    data = _session_attendance()
     
     if request.method == "POST":
         # Handle lab record upload
@@ -1023,11 +1654,17 @@ def lab():
             if not username or not password:
                 return render_template("lab.html", data=data, error="Session expired. Please login again.")
             
-            # Compress images to PDF
-            pdf_file = compress_images_to_pdf(images)
-            
-            # Upload to website
-            result = upload_lab_record(username, password, lab_code, week_no, title, pdf_file)
+            # Convert images to PDF while the driver logs in and fills the form
+            fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+            os.close(fd)
+            pdf_future = _pdf_executor.submit(compress_images_to_pdf, images, 1, pdf_path)
+            try:
+                result = upload_lab_record(username, password, lab_code, week_no, title, pdf_future,
+                                           deadline=submission_deadline(request.form.get('submission_date')))
+            finally:
+                # The images belong to this request, so never leave conversion running past it
+                pdf_future.exception()
+                os.unlink(pdf_path)
             
             if result["success"]:
                 return render_template("lab.html", data=data, success=result["message"])
@@ -1039,6 +1676,62 @@ def lab():
     
     return render_template("lab.html", data=data)
 
+@app.route("/lab/batch", methods=["POST"])
+def lab_batch():
+    """Upload several weeks at once: fields are items-<n>-lab_code/week_no/title/images"""
+    data = _session_attendance()
+    username = session.get('username')
+    password = session.get('password')
+
+    if not username or not password:
+        return render_template("lab.html", data=data, error="Session expired. Please login again.")
+
+    indexes = sorted({
+        int(m.group(1)) for key in request.form
+        for m in [re.match(r'items-(\d+)-lab_code$', key)] if m
+    })
+    groups = []
+    for n in indexes:
+        group = {
+            "lab_code": request.form.get(f'items-{n}-lab_code'),
+            "week_no": request.form.get(f'items-{n}-week_no'),
+            "title": request.form.get(f'items-{n}-title'),
+            "deadline": submission_deadline(request.form.get(f'items-{n}-submission_date')),
+            # Sort images by filename to preserve order
+            "images": sorted(request.files.getlist(f'items-{n}-images'), key=lambda f: f.filename),
+        }
+        if not all([group["lab_code"], group["week_no"], group["title"]]) or not group["images"]:
+            return render_template("lab.html", data=data, error=f"Missing required data for batch item {len(groups) + 1}")
+        groups.append(group)
+
+    if not groups:
+        return render_template("lab.html", data=data, error="Add at least one week to upload")
+
+    # Convert every group in parallel while the single portal session logs in
+    pdf_paths = []
+    for group in groups:
+        fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        pdf_paths.append(pdf_path)
+        group["pdf"] = _pdf_executor.submit(compress_images_to_pdf, group["images"], 1, pdf_path)
+    try:
+        results = upload_lab_records_batch(username, password, groups)
+    finally:
+        for group, pdf_path in zip(groups, pdf_paths):
+            group["pdf"].exception()
+            os.unlink(pdf_path)
+
+    batch_results = [
+        {"lab_code": g["lab_code"], "week_no": g["week_no"], "title": g["title"],
+         "success": r["success"], "message": r["message"]}
+        for g, r in zip(groups, results)
+    ]
+    uploaded = sum(1 for r in batch_results if r["success"])
+    summary = f"Uploaded {uploaded} of {len(batch_results)} lab records."
+    if uploaded == len(batch_results):
+        return render_template("lab.html", data=data, success=summary, batch_results=batch_results)
+    return render_template("lab.html", data=data, error=summary, batch_results=batch_results)
+
 @app.route("/get_lab_subjects", methods=["POST"])
 def get_lab_subjects_route():
     """API endpoint to fetch lab subjects"""
@@ -1098,8 +1791,33 @@ def get_experiment_title_route():
 
 @app.route("/profile", methods=["GET"])
 def profile():
-    data = session.get('attendance_data')
-    return render_template("profile.html", data=data)
+    data = _session_attendance()
+    if not data:
+        return render_template("profile.html", data=data)
+    return _versioned_page(data, lambda: render_template("profile.html", data=data))
+
+@app.route("/api/attendance", methods=["GET"])
+def api_attendance():
+    """Attendance as JSON with an increasing integer version; ?since=<version> returns only what changed"""
+    username = session.get('username')
+    password = session.get('password')
+    if not username or not password:
+        return {"error": "Not logged in"}, 401
+    # The latest stored result, which the background refresher may have updated since login
+    data, _ = _last_known_attendance(username, password)
+    data = data or session.get('attendance_data')
+    if not data:
+        return {"error": "No attendance data yet"}, 404
+
+    version = data.get("version") or data_version(data)
+    log = cache_get(f"att_log:{username}")
+    if not log or log.get("version") != version:
+        # The log was evicted: start a new one, which sends every client a full snapshot
+        log = advance(None, None, dict(data, version=version))
+        cache_set(f"att_log:{username}", log, ttl_seconds=30 * 86400)
+
+    since = request.args.get("since", type=int)
+    return changes_since(log, data, since), 200, {"Cache-Control": "private, no-cache"}
 
 @app.route("/ping", methods=["GET"])
 def ping():
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+try:
+    from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+except ImportError:  # optional dependency, only needed when SCRAPE_ENGINE=async
+    async_playwright = None
+    PlaywrightTimeoutError = None
+
+BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+
+
+class _TextRow:
+    """Minimal stand-in for a Selenium row element, exposing only `.text`"""
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class AsyncScrapeEngine:
+    """Scrapes attendance for many users concurrently from one Chrome process.
+
+    A single browser is launched on a private event loop thread. Every scrape
+    gets its own incognito-like browser context (separate cookies, storage and
+    cache) that is closed as soon as the scrape ends, so a concurrent scrape
+    costs one tab instead of one Chrome. Parsing is delegated to the same
+    `calculate_attendance_percentage` used by the Selenium path.
+    """
+
+    def __init__(self, parse_rows, login_url, attendance_url, max_contexts=20,
+                 executable_path=None, user_agent=None, login_rejected=None):
+        if async_playwright is None:
+            raise RuntimeError("playwright is not installed; run `pip install playwright`")
+        self.parse_rows = parse_rows
+        # Pattern matching the portal's "wrong password" message; anything else is a timeout
+        self.login_rejected = login_rejected
+        self.login_url = login_url
+        self.attendance_url = attendance_url
+        self.max_contexts = max_contexts
+        self.executable_path = executable_path
+        self.user_agent = user_agent
+        self.loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = None
+        self._semaphore = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="async-scraper", daemon=True)
+            self._thread.start()
+            ready.wait()
+            logger.info(f"Async scrape engine started (max {self.max_contexts} contexts)")
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self._browser_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.max_contexts)
+        ready.set()
+        self.loop.run_forever()
+
+    def scrape(self, username, password, timeout=90):
+        """Blocking entry point for request threads"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self._scrape(username, password), self.loop)
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    async def _ensure_browser(self):
+        async with self._browser_lock:
+            if self._browser and self._browser.is_connected():
+                return self._browser
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(
+                headless=True,
+                executable_path=self.executable_path,
+                args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu", "--disable-extensions"],
+            )
+            logger.info("Launched shared Chrome for async scrape engine")
+            return self._browser
+
+    async def _block_heavy_resources(self, route):
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _scrape(self, username, password):
+        async with self._semaphore:
+            browser = await self._ensure_browser()
+            context = await browser.new_context(user_agent=self.user_agent)
+            try:
+                await context.route("**/*", self._block_heavy_resources)
+                page = await context.new_page()
+                page.set_default_timeout(15000)
+                dialogs = []
+
+                async def on_dialog(dialog):
+                    dialogs.append(dialog.message)
+                    await dialog.accept()
+
+                page.on("dialog", on_dialog)
+
+                logger.info(f"Starting async attendance scrape for user: {username}")
+                await page.goto(self.login_url, wait_until="domcontentloaded")
+                await page.fill("#txt_uname", username)
+                await page.fill("#txt_pwd", password)
+                await page.click("#but_submit")
+
+                # Wait for the redirect instead of sleeping a fixed amount
+                try:
+                    await page.wait_for_url("**home**", timeout=10000)
+                except PlaywrightTimeoutError:
+                    messages = list(dialogs)
+                    if await page.locator("#txt_pwd").count():
+                        messages.append(await page.locator("body").inner_text())
+                    if self.login_rejected and any(self.login_rejected.search(m) for m in messages):
+                        logger.warning(f"Login failed for user: {username}")
+                        return {"error": "Invalid username or password.", "invalid_credentials": True}
+                    logger.warning(f"Login timed out for user: {username}")
+                    return {"error": "The college portal took too long to log you in.", "transient": True}
+
+                await page.goto(self.attendance_url, wait_until="domcontentloaded")
+                try:
+                    await page.wait_for_selector("tr", timeout=10000)
+                except PlaywrightTimeoutError:
+                    pass
+                texts = await page.locator("tr").all_inner_texts()
+
+                if not texts:
+                    logger.warning(f"No attendance data found for user: {username}")
+                    return {"error": "No attendance data found (maybe server issue)."}
+
+                logger.info(f"Successfully scraped attendance data for user: {username}")
+                return self.parse_rows([_TextRow(t) for t in texts])
+            finally:
+                await context.close()
+
+    async def _shutdown(self):
+        if self._browser:
+            await self._browser.close()
+        if self._playwright:
+            await self._playwright.stop()
+
+    def close(self):
+        if not self.loop or not self.loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout=10)
+        except Exception as e:
+            logger.error(f"Error shutting down async scrape engine: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
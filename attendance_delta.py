@@ -0,0 +1,113 @@
+import time
+
+from attendance_index import AttendanceIndex
+
+# Revisions kept per user; a client further behind than this gets a full snapshot
+MAX_CHANGES = 20
+
+
+def _day_rows(data):
+    return {
+        (course, day.isoformat()): (present, absent)
+        for course, day, present, absent in AttendanceIndex.from_result(data).records()
+    }
+
+
+def diff_attendance(old, new):
+    """What changed from `old` to `new`: changed or added subjects, removed codes, new or corrected days and removed days"""
+    old_subjects = (old or {}).get("subjects", {})
+    new_subjects = new.get("subjects", {})
+    old_days = _day_rows(old) if old else {}
+    new_days = _day_rows(new)
+    return {
+        "subjects": {code: sub for code, sub in new_subjects.items() if old_subjects.get(code) != sub},
+        "removed": [code for code in old_subjects if code not in new_subjects],
+        "days": [
+            [course, day, present, absent]
+            for (course, day), (present, absent) in sorted(new_days.items(), key=lambda item: item[0][1])
+            if old_days.get((course, day)) != (present, absent)
+        ],
+        "removed_days": sorted(([course, day] for course, day in old_days if (course, day) not in new_days),
+                               key=lambda row: row[1]),
+    }
+
+
+def advance(log, old, new):
+    """Return the user's change log after storing `new`, bumping the revision if anything changed.
+
+    A log is {"revision": int, "version": content hash, "changes": [...]}. A
+    user without one starts at the current Unix time, so revisions keep
+    increasing even when the cache that holds the log is lost.
+    """
+    if log and log.get("version") == new.get("version"):
+        return log
+    if not log:
+        return {"revision": int(time.time()), "version": new.get("version"), "changes": []}
+    revision = log["revision"] + 1
+    changes = log["changes"] + [dict(diff_attendance(old, new), revision=revision)]
+    return {"revision": revision, "version": new.get("version"), "changes": changes[-MAX_CHANGES:]}
+
+
+def snapshot(log, data, required=False):
+    """Everything the client needs: summary, all subjects and every dated row.
+
+    `required` marks a snapshot sent in place of a delta the log could not
+    produce; the client must replace its copy rather than merge.
+    """
+    return {
+        "version": log["revision"],
+        "full": True,
+        "snapshot_required": required,
+        "overall": data.get("overall", {}),
+        "subjects": data.get("subjects", {}),
+        "days": [[course, day, present, absent] for (course, day), (present, absent)
+                 in sorted(_day_rows(data).items(), key=lambda item: item[0][1])],
+    }
+
+
+def changes_since(log, data, since):
+    """Delta from revision `since` to now, or a full snapshot when `since` is unknown or too old.
+
+    A `since` the log cannot continue from (older than its retained changes,
+    from before the log was restarted, or newer than it) gets a snapshot with
+    "snapshot_required" set.
+    """
+    if since is None:
+        return snapshot(log, data)
+    if since == log["revision"]:
+        return {"version": since, "full": False, "changed": False}
+    if since > log["revision"]:
+        return snapshot(log, data, required=True)
+    changes = [change for change in log["changes"] if change["revision"] > since]
+    if not changes or changes[0]["revision"] != since + 1:
+        return snapshot(log, data, required=True)
+
+    subjects = {}
+    removed = []
+    days = {}
+    removed_days = set()
+    for change in changes:
+        for code in change["removed"]:
+            subjects.pop(code, None)
+            removed.append(code)
+        for code, sub in change["subjects"].items():
+            subjects[code] = sub
+            if code in removed:
+                removed.remove(code)
+        # Logs written before removed days were tracked have none
+        for course, day in change.get("removed_days", ()):
+            days.pop((course, day), None)
+            removed_days.add((course, day))
+        for course, day, present, absent in change["days"]:
+            days[(course, day)] = [course, day, present, absent]
+            removed_days.discard((course, day))
+    return {
+        "version": log["revision"],
+        "full": False,
+        "changed": True,
+        "overall": data.get("overall", {}),
+        "subjects": subjects,
+        "removed": removed,
+        "days": sorted(days.values(), key=lambda row: row[1]),
+        "removed_days": [list(key) for key in sorted(removed_days, key=lambda key: key[1])],
+    }
@@ -0,0 +1,202 @@
+import base64
+from array import array
+from datetime import datetime, timedelta
+
+
+class AttendanceIndex:
+    """Attendance counts laid out by semester day.
+
+    Slot i holds day `start + i`. Each course has two packed byte arrays with
+    the present and absent periods for every day, so day lookups are plain
+    indexing and no date strings are parsed after the scrape. Totals across
+    courses and prefix sums for range queries are built once, on first use.
+
+    Days with a dated row but neither PRESENT nor ABSENT (a class held but not
+    yet marked) are kept per course in `unmarked`; like an absence, they end
+    a streak.
+    """
+
+    def __init__(self, start=None, days=0):
+        self.start = start
+        self.days = days
+        self.present = {}
+        self.absent = {}
+        self.unmarked = {}
+        self._totals = None
+        self._prefix = {}
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from (course, date, present, absent) tuples in any order"""
+        records = list(records)
+        if not records:
+            return cls()
+        first = min(r[1] for r in records)
+        last = max(r[1] for r in records)
+        index = cls(first, (last - first).days + 1)
+        for course, day, present, absent in records:
+            index.add(course, day, present, absent)
+        return index
+
+    @classmethod
+    def from_json(cls, payload):
+        if not payload or not payload.get("start"):
+            return cls()
+        start = datetime.strptime(payload["start"], "%Y-%m-%d").date()
+        index = cls(start, payload["days"])
+        for course, (present, absent) in payload["courses"].items():
+            index.present[course] = array("B", base64.b64decode(present))
+            index.absent[course] = array("B", base64.b64decode(absent))
+        # Absent from payloads stored before unmarked days were kept
+        for course, slots in payload.get("unmarked", {}).items():
+            index.unmarked[course] = set(slots)
+        return index
+
+    @classmethod
+    def from_result(cls, data):
+        """Index for a parsed attendance result, including ones cached before `day_index` existed"""
+        if "day_index" in data:
+            return cls.from_json(data["day_index"])
+        records = []
+        for course, days in data.get("per_course_date_attendance", {}).items():
+            for date_key, counts in days.items():
+                try:
+                    day = datetime.strptime(date_key, "%d-%m-%Y").date()
+                except ValueError:
+                    continue
+                records.append((course, day, counts["present"], counts["absent"]))
+        return cls.from_records(records)
+
+    def to_json(self):
+        """Compact JSON-safe form: base64 of the packed per-course arrays"""
+        return {
+            "start": self.start.isoformat() if self.start else None,
+            "days": self.days,
+            "courses": {
+                course: [
+                    base64.b64encode(self.present[course].tobytes()).decode("ascii"),
+                    base64.b64encode(self.absent[course].tobytes()).decode("ascii"),
+                ]
+                for course in self.present
+            },
+            "unmarked": {course: sorted(slots) for course, slots in self.unmarked.items()},
+        }
+
+    def add(self, course, day, present, absent):
+        if course not in self.present:
+            self.present[course] = array("B", bytes(self.days))
+            self.absent[course] = array("B", bytes(self.days))
+        i = (day - self.start).days
+        self.present[course][i] = min(255, self.present[course][i] + present)
+        self.absent[course][i] = min(255, self.absent[course][i] + absent)
+        if not present and not absent:
+            self.unmarked.setdefault(course, set()).add(i)
+        self._totals = None
+        self._prefix = {}
+
+    def day(self, i):
+        return self.start + timedelta(days=i)
+
+    def _series(self, course=None):
+        """(present, absent) arrays for one course, or summed over all courses"""
+        if course is not None:
+            empty = array("B", bytes(self.days))
+            return self.present.get(course, empty), self.absent.get(course, empty)
+        if self._totals is None:
+            present = array("H", bytes(2 * self.days))
+            absent = array("H", bytes(2 * self.days))
+            for code in self.present:
+                course_present, course_absent = self.present[code], self.absent[code]
+                for i in range(self.days):
+                    present[i] += course_present[i]
+                    absent[i] += course_absent[i]
+            self._totals = (present, absent)
+        return self._totals
+
+    def _unmarked(self, course=None):
+        if course is not None:
+            return self.unmarked.get(course, set())
+        return set().union(*self.unmarked.values())
+
+    def streak(self, course=None):
+        """Consecutive most recent class days with at least one period attended"""
+        present, absent = self._series(course)
+        unmarked = self._unmarked(course)
+        streak = 0
+        for i in range(self.days - 1, -1, -1):
+            if present[i]:
+                streak += 1
+            elif absent[i] or i in unmarked:
+                break
+        return streak
+
+    def attended_days(self, course=None):
+        present, _ = self._series(course)
+        return sum(1 for p in present if p)
+
+    def absent_days(self, course=None):
+        present, absent = self._series(course)
+        return sum(1 for p, a in zip(present, absent) if a and not p)
+
+    def safe_bunk_days(self, course=None):
+        return max(0, self.attended_days(course) // 3 - self.absent_days(course))
+
+    def _prefix_sums(self, course=None):
+        sums = self._prefix.get(course)
+        if sums is None:
+            sums = []
+            for series in self._series(course):
+                running = array("L", [0])
+                total = 0
+                for count in series:
+                    total += count
+                    running.append(total)
+                sums.append(running)
+            self._prefix[course] = sums
+        return sums
+
+    def range_totals(self, since=None, until=None, course=None):
+        """(present, absent) periods between two dates, inclusive, in O(1)"""
+        if not self.days:
+            return 0, 0
+        lo = 0 if since is None else min(max((since - self.start).days, 0), self.days)
+        hi = self.days if until is None else min(max((until - self.start).days + 1, 0), self.days)
+        if hi <= lo:
+            return 0, 0
+        present, absent = self._prefix_sums(course)
+        return present[hi] - present[lo], absent[hi] - absent[lo]
+
+    def weekly(self, course=None):
+        """[(monday, present, absent)] for every week with recorded classes"""
+        if not self.days:
+            return []
+        present, absent = self._series(course)
+        weeks = []
+        # Slot where the first Monday-aligned week starts (may be negative)
+        i = -self.start.weekday()
+        while i < self.days:
+            lo, hi = max(i, 0), min(i + 7, self.days)
+            week_present = sum(present[lo:hi])
+            week_absent = sum(absent[lo:hi])
+            if week_present or week_absent:
+                weeks.append((self.day(i), week_present, week_absent))
+            i += 7
+        return weeks
+
+    def records(self, course=None):
+        """(course, date, present, absent) for every day with a class"""
+        courses = [course] if course is not None else list(self.present)
+        for code in courses:
+            present, absent = self._series(code)
+            for i in range(self.days):
+                if present[i] or absent[i]:
+                    yield code, self.day(i), present[i], absent[i]
+
+    def calendar(self):
+        """Calendar entries: 1 = attended something that day, -1 = only absences"""
+        present, absent = self._series()
+        return [
+            {"date": self.day(i).isoformat(), "value": 1 if present[i] else -1}
+            for i in range(self.days)
+            if present[i] or absent[i]
+        ]
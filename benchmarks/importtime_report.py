@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Startup cost report for the Flask app.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter, prints the
+slowest imports and checks that heavy subsystems stay out of the startup path.
+It also times a cold `/ping` through the Flask test client.
+
+Usage: python benchmarks/importtime_report.py [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only load on first use
+LAZY_MODULES = ["selenium", "webdriver_manager", "reportlab", "PIL", "tabulate", "upstash_redis", "playwright"]
+
+PING_SNIPPET = """
+import time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+resp = app.app.test_client().get('/ping')
+t2 = time.perf_counter()
+print(f"{(t1 - t0) * 1000:.1f} {(t2 - t1) * 1000:.1f} {resp.status_code}")
+"""
+
+
+def parse_importtime(stderr):
+    """Return [(module, self_us, cumulative_us)] from -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        entries.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def run_importtime():
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        sys.exit(proc.returncode)
+    return parse_importtime(proc.stderr)
+
+
+def run_ping():
+    proc = subprocess.run(
+        [sys.executable, "-c", PING_SNIPPET],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        return None
+    return proc.stdout.strip().splitlines()[-1].split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to show")
+    args = parser.parse_args()
+
+    entries = run_importtime()
+    app_entry = next((e for e in entries if e[0].strip() == "app"), None)
+    top_level = [e for e in entries if not e[0].startswith(" ")]
+
+    print("=== Import time (python -X importtime) ===")
+    if app_entry:
+        print(f"import app: {app_entry[2] / 1000:.1f} ms cumulative")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(entries, key=lambda e: e[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    loaded = {e[0].strip().split(".")[0] for e in entries}
+    eager = [m for m in LAZY_MODULES if m in loaded]
+    print("\n=== Lazy subsystems ===")
+    for module in LAZY_MODULES:
+        print(f"{module:<18} {'LOADED AT STARTUP' if module in eager else 'deferred'}")
+
+    ping = run_ping()
+    if ping:
+        import_ms, ping_ms, status = ping
+        print("\n=== Cold health check ===")
+        print(f"import: {import_ms} ms, first /ping: {ping_ms} ms (HTTP {status})")
+
+    print(f"\n{len(top_level)} top-level imports, {len(entries)} modules total")
+    return 1 if eager else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Memory budgets for the app's heaviest paths.
+
+Each case runs in a fresh interpreter with tracemalloc on while a thread polls
+the RSS of the process and its children (Chrome, when a case starts one). A
+case reports peak traced Python allocations, how far RSS grew above its
+pre-case baseline, and peak child RSS; any figure above its budget fails the
+run. The cases are:
+
+  parse      course_content rows -> attendance dict, plus the cached JSON blob size
+  dashboard  _render_dashboard() for that result
+  pdf_1/10/30  compress_images_to_pdf() on large camera-sized JPEGs
+  pool       WebDriverPool checkout/return cycles with a fake driver and portal
+
+Budgets are in MB (KB for blob_kb) and can be overridden per case and metric,
+e.g. --budget pdf_30.rss=220 --budget parse.blob_kb=40.
+
+Usage: python benchmarks/memory_budget.py [--cases parse,pdf_10] [--budget CASE.METRIC=LIMIT]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = ["parse", "dashboard", "pdf_1", "pdf_10", "pdf_30", "pool"]
+
+METRICS = ["traced", "rss", "children", "blob_kb"]
+
+# Sized for the 512 MB dyno, where Chrome needs most of the memory
+DEFAULT_BUDGETS = {
+    "parse": {"traced": 2, "rss": 16, "blob_kb": 12},
+    "dashboard": {"traced": 4, "rss": 16},
+    "pdf_1": {"traced": 4, "rss": 100},
+    "pdf_10": {"traced": 8, "rss": 110},
+    "pdf_30": {"traced": 16, "rss": 120},
+    "pool": {"traced": 2, "rss": 8, "children": 0},
+}
+
+COURSES = 10
+CLASSES_PER_COURSE = 60
+POOL_CYCLES = 500
+
+FAKE_PORTAL_HTML = "<html><body>" + "<tr><td>1</td><td>20 Aug, 2025</td><td>PRESENT</td></tr>" * 600 + "</body></html>"
+
+
+class RssSampler:
+    """Polls RSS of this process and all its descendants, keeping the peaks"""
+
+    def __init__(self, interval=0.005):
+        import psutil
+
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_children = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        rss = self.process.memory_info().rss
+        children = 0
+        for child in self.process.children(recursive=True):
+            try:
+                children += child.memory_info().rss
+            except Exception:
+                pass  # exited between listing and sampling
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_children = max(self.peak_children, children)
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+class _Row:
+    """Stands in for a Selenium <tr> element; the parser only reads .text"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def synthetic_rows():
+    rows = [_Row("S.No Date Period Topics Covered Status")]
+    for c in range(COURSES):
+        rows.append(_Row(f"ACS{c:03d} - Course Number {c} With A Long Descriptive Title"))
+        for i in range(CLASSES_PER_COURSE):
+            day = 1 + i % 28
+            month = ["Aug", "Sep", "Oct", "Nov"][i // 28 % 4]
+            status = "ABSENT" if (i + c) % 7 == 0 else "PRESENT"
+            rows.append(_Row(f"{i + 1} {day} {month}, 2025 {1 + i % 6} Unit {i % 5}: lecture on topic {i} {status}"))
+    return rows
+
+
+class FakeDriver:
+    """Enough of a WebDriver for the pool: loads a canned portal page"""
+
+    def __init__(self):
+        self.page_source = ""
+        self.cookies = {}
+
+    def get(self, url):
+        self.page_source = FAKE_PORTAL_HTML if "iare" in url else ""
+        if self.page_source:
+            self.cookies["PHPSESSID"] = os.urandom(16).hex()
+
+    def delete_all_cookies(self):
+        self.cookies.clear()
+
+    def quit(self):
+        pass
+
+
+def make_images(directory, count, size):
+    """Write `count` noisy camera-sized JPEGs (the worst case for re-encoding)"""
+    from PIL import Image, ImageDraw
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"page_{i}.jpg")
+        if not os.path.exists(path):
+            noise = Image.effect_noise(size, 24 + i % 8).convert("RGB")
+            ImageDraw.Draw(noise).text((size[0] // 4, size[1] // 4), f"Week {i}", fill=(0, 0, 0))
+            noise.save(path, format="JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def run_case(case, image_dir):
+    """Run one case in this (fresh) interpreter and return its measurements"""
+    import tracemalloc
+    import gc
+
+    sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault("HISTORY_DB_PATH", "")
+    import app
+
+    # Everything a case needs is loaded before the baseline
+    rows = synthetic_rows()
+    data = app.calculate_attendance_percentage(synthetic_rows())
+    if case.startswith("pdf_"):
+        from PIL import Image  # noqa: F401
+        import reportlab.pdfgen.canvas  # noqa: F401
+        image_paths = sorted(os.path.join(image_dir, f) for f in os.listdir(image_dir))[:int(case[4:])]
+    if case == "dashboard":
+        import tabulate  # noqa: F401
+    gc.collect()
+
+    sampler = RssSampler()
+    baseline = sampler.sample()
+    sampler.peak_rss = baseline
+    sampler.start()
+    tracemalloc.start()
+    extra = {}
+    started = time.perf_counter()
+
+    if case == "parse":
+        result = app.calculate_attendance_percentage(rows)
+        app.cache_set("attendance:bench", result)
+        extra["blob_kb"] = len(json.dumps(app._inmem_cache["attendance:bench"][1])) / 1024
+    elif case == "dashboard":
+        with app.app.test_request_context("/dashboard"):
+            html = app._render_dashboard(data)
+        extra["html_kb"] = len(html) / 1024
+    elif case.startswith("pdf_"):
+        files = [open(path, "rb") for path in image_paths]
+        try:
+            with tempfile.TemporaryDirectory() as out:
+                pdf_path = app.compress_images_to_pdf(files, 1, os.path.join(out, "record.pdf"))
+                extra["pdf_kb"] = os.path.getsize(pdf_path) / 1024
+        finally:
+            for f in files:
+                f.close()
+    elif case == "pool":
+        from webdriver_pool import WebDriverPool
+
+        pool = WebDriverPool(max_drivers=3, use_contexts=False)
+        pool._create_driver = FakeDriver
+        for _ in range(POOL_CYCLES):
+            driver = pool.get_driver(timeout=5)
+            driver.get(app.ATTENDANCE_URL)
+            pool.return_driver(driver)
+        pool.cleanup_all()
+
+    elapsed = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    sampler.stop()
+
+    mb = 1024 * 1024
+    return dict(
+        traced=traced_peak / mb,
+        rss=(sampler.peak_rss - baseline) / mb,
+        children=sampler.peak_children / mb,
+        baseline=baseline / mb,
+        seconds=elapsed,
+        **extra,
+    )
+
+
+def measure(case, image_dir):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", case, "--image-dir", image_dir],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def parse_budgets(overrides):
+    budgets = {case: dict(limits) for case, limits in DEFAULT_BUDGETS.items()}
+    for override in overrides:
+        key, _, value = override.partition("=")
+        case, _, metric = key.partition(".")
+        if case not in budgets or metric not in METRICS or not value:
+            raise SystemExit(f"Bad budget {override!r}; expected CASE.METRIC=LIMIT with METRIC in {METRICS}")
+        budgets[case][metric] = float(value)
+    return budgets
+
+
+def run_cases(cases, budgets, image_dir):
+    failures = []
+    print(f"{'case':<10} {'traced MB':>10} {'RSS +MB':>9} {'child MB':>9} {'seconds':>8}  notes")
+    for case in cases:
+        result = measure(case, image_dir)
+        if result is None:
+            failures.append(f"{case}: crashed")
+            continue
+        notes = []
+        for metric, limit in budgets[case].items():
+            if result.get(metric, 0) > limit:
+                failures.append(f"{case}: {metric} {result[metric]:.1f} > budget {limit:g}")
+                notes.append(f"{metric} OVER {limit:g}")
+        notes += [f"{k}={v:.1f}" for k, v in result.items() if k.endswith("_kb")]
+        print(f"{case:<10} {result['traced']:>10.1f} {result['rss']:>9.1f} {result['children']:>9.1f} "
+              f"{result['seconds']:>8.2f}  {' '.join(notes)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated cases to run")
+    parser.add_argument("--budget", action="append", default=[], metavar="CASE.METRIC=LIMIT",
+                        help="override a budget (MB, or KB for blob_kb)")
+    parser.add_argument("--image-size", default="3024x4032", help="WxH of the generated test photos")
+    parser.add_argument("--image-dir", help="reuse generated images from this directory")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child, args.image_dir)))
+        return 0
+
+    budgets = parse_budgets(args.budget)
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    image_dir = args.image_dir or tempfile.mkdtemp(prefix="memory_budget_")
+    pdf_counts = [int(c[4:]) for c in cases if c.startswith("pdf_")]
+    if pdf_counts:
+        width, height = (int(v) for v in args.image_size.split("x"))
+        print(f"Preparing {max(pdf_counts)} {args.image_size} images in {image_dir}...")
+        make_images(image_dir, max(pdf_counts), (width, height))
+
+    try:
+        failures = run_cases(cases, budgets, image_dir)
+    finally:
+        if not args.image_dir:
+            shutil.rmtree(image_dir, ignore_errors=True)
+
+    if failures:
+        print("\n=== Over budget ===")
+        for failure in failures:
+            print(failure)
+        return 1
+    print("\nAll cases within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Synthetic image corpus for the lab-record PDF pipeline.
+
+Generates photos of "handwritten pages" in the shapes students actually upload:
+phone-camera JPEGs, HEIC-sized (heavily compressed) JPEGs, screenshots and
+scans as PNG, RGBA and palette images, CMYK and greyscale JPEGs, extreme
+aspect ratios and pages already resized by the lab form. Everything is drawn
+from a fixed seed, so a corpus is identical across machines and runs. A
+manifest.json next to the images records each file's format, mode and size.
+
+benchmarks/pdf_throughput.py builds its runs from this corpus.
+
+Usage: python benchmarks/pdf_corpus.py [--out DIR] [--seed 1]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DIR = os.path.join(REPO_ROOT, "benchmarks", ".pdf_corpus")
+
+# (name, (width, height), mode, format, save options)
+SPECS = [
+    ("phone_12mp_portrait", (3024, 4032), "RGB", "JPEG", {"quality": 92}),
+    ("phone_12mp_landscape", (4032, 3024), "RGB", "JPEG", {"quality": 90}),
+    ("phone_48mp", (8000, 6000), "RGB", "JPEG", {"quality": 85}),
+    ("phone_progressive", (3000, 4000), "RGB", "JPEG", {"quality": 88, "progressive": True}),
+    ("heic_like_12mp", (3024, 4032), "RGB", "JPEG", {"quality": 55}),
+    ("messenger_recompressed", (1200, 1600), "RGB", "JPEG", {"quality": 70}),
+    ("scan_greyscale", (2480, 3508), "L", "JPEG", {"quality": 90}),
+    ("scan_cmyk", (2480, 3508), "CMYK", "JPEG", {"quality": 90}),
+    ("screenshot_png", (1080, 2400), "RGB", "PNG", {}),
+    ("scan_png", (2480, 3508), "RGB", "PNG", {"compress_level": 6}),
+    ("cutout_rgba", (2000, 2000), "RGBA", "PNG", {}),
+    ("palette_png", (1200, 1600), "P", "PNG", {}),
+    ("panorama", (8000, 600), "RGB", "JPEG", {"quality": 90}),
+    ("long_screenshot", (1080, 12000), "RGB", "PNG", {}),
+    ("thin_strip", (40, 4000), "RGB", "JPEG", {"quality": 90}),
+    ("tiny", (120, 90), "RGB", "JPEG", {"quality": 90}),
+    ("form_resized", (555, 740), "RGB", "JPEG", {"quality": 85}),
+    ("form_resized_portrait", (555, 801), "RGB", "JPEG", {"quality": 85}),
+]
+
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png"}
+
+
+def page_photo(size, seed):
+    """An unevenly lit, slightly noisy sheet of ruled paper with handwriting-like strokes"""
+    from PIL import Image, ImageChops, ImageDraw
+
+    rng = random.Random(seed)
+    width, height = size
+    # Lighting falls off towards one corner, as in a phone photo of a desk
+    light = Image.linear_gradient("L").rotate(rng.choice([0, 90, 180, 270])).resize(size)
+    page = light.point(lambda v: 255 - v // 5)
+    draw = ImageDraw.Draw(page)
+    line_gap = max(4, height // 40)
+    stroke = max(1, min(width, height) // 400)
+    for y in range(line_gap * 2, height - line_gap, line_gap):
+        draw.line([(0, y), (width, y)], fill=190, width=stroke)
+        x = rng.randint(width // 20, width // 8)
+        while x < width * 0.9 and rng.random() < 0.97:
+            word = rng.randint(width // 30 + 1, width // 10 + 2)
+            points = [(x + i * word // 6, y - rng.randint(2, max(3, line_gap * 2 // 3))) for i in range(7)]
+            draw.line(points, fill=rng.randint(20, 70), width=stroke + 1)
+            x += word + rng.randint(width // 80 + 1, width // 40 + 2)
+    noise = Image.effect_noise(size, 10 + seed % 6).point(lambda v: v // 8)
+    page = ImageChops.subtract(page, noise)
+    # Blue ink and a warm paper tint
+    return Image.merge("RGB", (page.point(lambda v: min(255, v + 6)), page, page.point(lambda v: min(255, v + 18))))
+
+
+def convert(image, mode):
+    from PIL import Image
+
+    if mode == "RGBA":
+        alpha = Image.radial_gradient("L").resize(image.size).point(lambda v: 255 - v // 2)
+        image = image.copy()
+        image.putalpha(alpha)
+        return image
+    if mode == "P":
+        return image.convert("P", palette=Image.ADAPTIVE, colors=64)
+    return image.convert(mode)
+
+
+def build_corpus(out_dir=DEFAULT_DIR, seed=1, log=print):
+    """Generate any missing corpus images into `out_dir` and return the manifest entries"""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("seed") == seed and all(
+            os.path.exists(os.path.join(out_dir, entry["file"])) for entry in manifest["images"]
+        ) and len(manifest["images"]) == len(SPECS):
+            return manifest["images"]
+
+    entries = []
+    for index, (name, size, mode, fmt, options) in enumerate(SPECS):
+        filename = name + EXTENSIONS[fmt]
+        path = os.path.join(out_dir, filename)
+        image = convert(page_photo(size, seed * 1000 + index), mode)
+        image.save(path, format=fmt, **options)
+        entries.append({
+            "file": filename,
+            "name": name,
+            "format": fmt,
+            "mode": mode,
+            "width": size[0],
+            "height": size[1],
+            "bytes": os.path.getsize(path),
+        })
+        log(f"  {filename:<32} {size[0]:>5}x{size[1]:<5} {mode:<4} {entries[-1]['bytes'] / 1024:>8.0f} KB")
+
+    with open(manifest_path, "w") as f:
+        json.dump({"seed": seed, "images": entries}, f, indent=2)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=DEFAULT_DIR, help="directory for the corpus")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the generated images")
+    args = parser.parse_args()
+
+    print(f"Building PDF corpus in {args.out}")
+    entries = build_corpus(args.out, args.seed)
+    total = sum(entry["bytes"] for entry in entries)
+    print(f"{len(entries)} images, {total / 1024 / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
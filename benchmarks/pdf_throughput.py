@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Throughput and size benchmark for compress_images_to_pdf().
+
+Builds uploads of 1-50 pages from the synthetic corpus (see pdf_corpus.py) and
+converts each the way /lab does: Werkzeug FileStorage objects in, a PDF file
+out. For every page count it reports pages/second, median conversion time,
+peak RSS growth, output size against the --max-size-mb target and the share
+of runs that ended up over it.
+
+Each page count runs in a fresh interpreter so peak RSS is not inherited from
+a larger run. --save writes the results as JSON; --baseline compares against a
+saved run and exits 1 if throughput drops or more runs exceed the size limit.
+
+Usage: python benchmarks/pdf_throughput.py [--pages 1,5,10,25,50] [--trials 3] [--save out.json] [--baseline base.json]
+"""
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pdf_corpus import DEFAULT_DIR, build_corpus  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PAGES = "1,5,10,25,50"
+
+
+def upload_sets(entries, pages, trials, seed, only=None):
+    """Deterministic page mixes: `trials` uploads of `pages` images drawn from the corpus"""
+    names = [entry["file"] for entry in entries if not only or any(o in entry["name"] for o in only)]
+    rng = random.Random(seed * 100 + pages)
+    return [[rng.choice(names) for _ in range(pages)] for _ in range(trials)]
+
+
+def run_page_count(corpus_dir, pages, trials, seed, max_size_mb, only):
+    """Convert every upload for one page count in this (fresh) interpreter"""
+    sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault("HISTORY_DB_PATH", "")
+    import app
+    from memory_budget import RssSampler
+    from werkzeug.datastructures import FileStorage
+
+    with open(os.path.join(corpus_dir, "manifest.json")) as f:
+        entries = json.load(f)["images"]
+    contents = {}
+    for entry in entries:
+        with open(os.path.join(corpus_dir, entry["file"]), "rb") as f:
+            contents[entry["file"]] = f.read()
+
+    # Warm the lazy imports so the first run is not charged for them
+    with tempfile.TemporaryDirectory() as out:
+        app.compress_images_to_pdf([io.BytesIO(contents[entries[-1]["file"]])], max_size_mb, os.path.join(out, "warm.pdf"))
+
+    sampler = RssSampler()
+    baseline = sampler.sample()
+    sampler.peak_rss = baseline
+    sampler.start()
+    runs = []
+    with tempfile.TemporaryDirectory() as out:
+        for trial, upload in enumerate(upload_sets(entries, pages, trials, seed, only)):
+            files = [FileStorage(io.BytesIO(contents[name]), filename=name) for name in upload]
+            pdf_path = os.path.join(out, f"record_{trial}.pdf")
+            started = time.perf_counter()
+            app.compress_images_to_pdf(files, max_size_mb, pdf_path)
+            runs.append({
+                "seconds": time.perf_counter() - started,
+                "bytes": os.path.getsize(pdf_path),
+                "input_bytes": sum(len(contents[name]) for name in upload),
+            })
+            os.remove(pdf_path)
+    sampler.stop()
+    return {"pages": pages, "runs": runs, "peak_rss_mb": (sampler.peak_rss - baseline) / 1024 / 1024}
+
+
+def summarise(result, max_size_mb):
+    runs = result["runs"]
+    limit = max_size_mb * 1024 * 1024
+    total_seconds = sum(r["seconds"] for r in runs)
+    return {
+        "pages": result["pages"],
+        "pages_per_second": result["pages"] * len(runs) / total_seconds if total_seconds else 0.0,
+        "median_seconds": statistics.median(r["seconds"] for r in runs),
+        "peak_rss_mb": result["peak_rss_mb"],
+        "mean_size_ratio": statistics.mean(r["bytes"] for r in runs) / limit,
+        "max_size_ratio": max(r["bytes"] for r in runs) / limit,
+        "over_limit_share": sum(r["bytes"] > limit for r in runs) / len(runs),
+        "input_mb": statistics.mean(r["input_bytes"] for r in runs) / 1024 / 1024,
+    }
+
+
+def measure(args, pages):
+    command = [sys.executable, os.path.abspath(__file__), "--child", str(pages), "--corpus", args.corpus,
+               "--trials", str(args.trials), "--seed", str(args.seed), "--max-size-mb", str(args.max_size_mb)]
+    if args.only:
+        command += ["--only", args.only]
+    proc = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(rows, baseline, tolerance):
+    """Regressions against a saved run: slower throughput, or more runs over the size limit"""
+    previous = {row["pages"]: row for row in baseline["results"]}
+    regressions = []
+    print(f"\n=== Against baseline (tolerance {tolerance:.0%}) ===")
+    for row in rows:
+        old = previous.get(row["pages"])
+        if not old:
+            continue
+        speedup = row["pages_per_second"] / old["pages_per_second"] if old["pages_per_second"] else 0.0
+        size = row["mean_size_ratio"] / old["mean_size_ratio"] if old["mean_size_ratio"] else 0.0
+        print(f"{row['pages']:>5} pages: throughput x{speedup:.2f}, size x{size:.2f}, "
+              f"over limit {old['over_limit_share']:.0%} -> {row['over_limit_share']:.0%}")
+        if speedup < 1 - tolerance:
+            regressions.append(f"{row['pages']} pages: throughput x{speedup:.2f}")
+        if row["over_limit_share"] > old["over_limit_share"]:
+            regressions.append(f"{row['pages']} pages: {row['over_limit_share']:.0%} of runs over the size limit")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default=DEFAULT_PAGES, help="comma-separated page counts")
+    parser.add_argument("--trials", type=int, default=3, help="uploads per page count")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the corpus and page mixes")
+    parser.add_argument("--max-size-mb", type=float, default=1, help="target passed to compress_images_to_pdf")
+    parser.add_argument("--only", help="comma-separated substrings; only corpus images whose name matches")
+    parser.add_argument("--corpus", default=DEFAULT_DIR, help="corpus directory (generated if missing)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed throughput drop against the baseline")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    only = [o.strip() for o in args.only.split(",")] if args.only else None
+
+    if args.child:
+        print(json.dumps(run_page_count(args.corpus, args.child, args.trials, args.seed, args.max_size_mb, only)))
+        return 0
+
+    print(f"Corpus: {args.corpus}")
+    build_corpus(args.corpus, args.seed)
+
+    rows = []
+    print(f"{'pages':>5} {'pages/s':>8} {'median s':>9} {'RSS +MB':>8} {'input MB':>9} "
+          f"{'size/target':>12} {'max':>6} {'over limit':>11}")
+    for pages in (int(p) for p in args.pages.split(",")):
+        result = measure(args, pages)
+        if result is None:
+            return 1
+        row = summarise(result, args.max_size_mb)
+        rows.append(row)
+        print(f"{pages:>5} {row['pages_per_second']:>8.1f} {row['median_seconds']:>9.2f} {row['peak_rss_mb']:>8.1f} "
+              f"{row['input_mb']:>9.1f} {row['mean_size_ratio']:>12.2f} {row['max_size_ratio']:>6.2f} "
+              f"{row['over_limit_share']:>11.0%}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"max_size_mb": args.max_size_mb, "seed": args.seed, "results": rows}, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(rows, json.load(f), args.tolerance)
+        if regressions:
+            print("\n=== Regressions ===")
+            for regression in regressions:
+                print(regression)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""Browser broker: one long-lived process owns the Chromes, web workers lease sessions.
+
+Run it next to gunicorn (see render.yaml) and set BROWSER_BROKER_SOCKET in
+the workers. Each lease is a Unix-socket connection: the worker asks for a
+driver with its work class and deadline, the broker takes one from its
+WebDriverPool (so DriverScheduler priorities and the pool limit apply across
+every worker) and replies with the session's WebDriver URL and id, which the
+worker attaches to. Closing the lease returns the session to the pool.
+
+A worker that dies mid-lease drops the connection and the broker reclaims the
+session at once; a worker that hangs past the lease timeout has its session
+quit. Recycling gunicorn workers no longer takes warm Chromes down with them.
+
+Usage: python browser_broker.py [--socket /tmp/browser-broker.sock] [--lease-seconds 360] [--warm 1]
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import TimeoutError
+
+from scheduler import BACKGROUND, INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/browser-broker.sock"
+
+
+def _send(stream, message):
+    stream.write(json.dumps(message).encode("utf-8") + b"\n")
+    stream.flush()
+
+
+def _close(sock, stream):
+    try:
+        stream.close()
+    except OSError:
+        pass  # unflushed writes to a peer that already hung up
+    sock.close()
+
+
+def _receive(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Connection closed")
+    return json.loads(line)
+
+
+class BrokerServer:
+    """Leases drivers from `pool` to clients connecting on `socket_path`"""
+
+    def __init__(self, pool, socket_path, lease_seconds=360):
+        self.pool = pool
+        self.socket_path = socket_path
+        self.lease_seconds = lease_seconds
+        self.leases = {}
+        self.lock = threading.Lock()
+        self.sock = None
+        self._stopped = threading.Event()
+
+    def _bind(self):
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                raise RuntimeError(f"A browser broker is already listening on {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.socket_path)
+            finally:
+                probe.close()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self.sock.listen(64)
+
+    def serve_forever(self):
+        self._bind()
+        logger.info(f"Browser broker listening on {self.socket_path} ({self.pool.max_drivers} drivers)")
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._handle, args=(conn,), name="broker-conn", daemon=True).start()
+
+    def shutdown(self):
+        self._stopped.set()
+        if self.sock is not None:
+            self.sock.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def status(self):
+        with self.lock:
+            leased = len(self.leases)
+        return {
+            "capacity": self.pool.max_drivers,
+            "free": self.pool.free_capacity(),
+            "waiting": self.pool.waiting,
+            "leased": leased,
+        }
+
+    def _handle(self, conn):
+        stream = conn.makefile("rwb")
+        try:
+            request = _receive(stream)
+            if request.get("op") == "status":
+                _send(stream, self.status())
+            elif request.get("op") == "lease":
+                self._lease(conn, stream, request)
+            else:
+                _send(stream, {"ok": False, "error": f"Unknown op {request.get('op')!r}"})
+        except Exception as e:
+            logger.error(f"Broker connection error: {e}")
+        finally:
+            _close(conn, stream)
+
+    def _lease(self, conn, stream, request):
+        try:
+            driver = self.pool.get_driver(
+                timeout=request.get("timeout", 30),
+                work_class=request.get("work_class", INTERACTIVE),
+                deadline=request.get("deadline"),
+            )
+        except Exception as e:
+            _send(stream, {"ok": False, "error": str(e), "timeout": isinstance(e, TimeoutError)})
+            return
+
+        lease_id = uuid.uuid4().hex
+        with self.lock:
+            self.leases[lease_id] = (driver, request.get("worker"))
+        outcome = "released"
+        try:
+            _send(stream, {
+                "ok": True,
+                "lease": lease_id,
+                "executor": driver.command_executor._url,
+                "session_id": driver.session_id,
+                "capabilities": driver.caps,
+                # Spares the worker a status round trip right after leasing
+                "status": self.status(),
+            })
+            conn.settimeout(self.lease_seconds)
+            release = _receive(stream)
+            if release.get("healthy", True):
+                self.pool.return_driver(driver)
+            else:
+                self.pool._cleanup_driver(driver)
+                outcome = "released broken"
+            _send(stream, {"ok": True})
+        except socket.timeout:
+            # The worker may still be driving it, so the session cannot be reused
+            outcome = "expired"
+            self.pool._cleanup_driver(driver)
+        except (ConnectionError, OSError, ValueError):
+            # Worker exited mid-lease; the session itself is fine once reset
+            outcome = "abandoned"
+            self.pool.return_driver(driver)
+        finally:
+            with self.lock:
+                self.leases.pop(lease_id, None)
+        if outcome in ("expired", "abandoned"):
+            logger.warning(f"Lease {lease_id[:8]} from worker {request.get('worker')} {outcome}, session reclaimed")
+
+    def warm(self, count):
+        """Start `count` browsers ahead of the first lease"""
+        drivers = []
+        for _ in range(min(count, self.pool.max_drivers)):
+            try:
+                drivers.append(self.pool.get_driver(timeout=60, work_class=BACKGROUND))
+            except Exception as e:
+                logger.error(f"Failed to warm a browser: {e}")
+                break
+        for driver in drivers:
+            self.pool.return_driver(driver)
+        if drivers:
+            logger.info(f"Warmed {len(drivers)} browsers")
+
+
+_leased_driver_cls = None
+
+
+def _leased_driver_class():
+    """Built on first use so Selenium stays out of the worker's import path"""
+    global _leased_driver_cls
+    if _leased_driver_cls is not None:
+        return _leased_driver_cls
+
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+    class LeasedDriver(WebDriver):
+        """A WebDriver attached to a session the broker already started"""
+
+        def __init__(self, executor, session_id, capabilities):
+            self._leased_session = (session_id, capabilities)
+            connection = ChromiumRemoteConnection(executor, vendor_prefix="goog", browser_name="chrome")
+            super().__init__(command_executor=connection, options=Options())
+
+        def start_session(self, capabilities):
+            self.session_id, self.caps = self._leased_session
+
+        def execute_cdp_cmd(self, cmd, cmd_args):
+            return self.execute("executeCdpCommand", {"cmd": cmd, "params": cmd_args})["value"]
+
+    _leased_driver_cls = LeasedDriver
+    return LeasedDriver
+
+
+class BrokerPool:
+    """Drop-in for WebDriverPool in web workers: drivers are leased from the broker.
+
+    `waiting` and free_capacity() come from the broker's status, fetched at
+    most once per `status_ttl` seconds and refreshed by every lease reply.
+    """
+
+    def __init__(self, socket_path, max_drivers, connect_timeout=10, status_ttl=0.5):
+        self.socket_path = socket_path
+        self.max_drivers = max_drivers
+        self.connect_timeout = connect_timeout
+        self.status_ttl = status_ttl
+        self.leases = {}
+        self.lock = threading.Lock()
+        self._status_cache = (0.0, None)
+
+    def _connect(self):
+        # The broker may still be starting alongside the workers
+        give_up = time.monotonic() + self.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                return sock
+            except OSError as e:
+                sock.close()
+                if time.monotonic() >= give_up:
+                    raise Exception(f"Browser broker unavailable at {self.socket_path}: {e}")
+                time.sleep(0.2)
+
+    def _remember_status(self, status):
+        with self.lock:
+            self._status_cache = (time.monotonic(), status)
+
+    def _status(self):
+        with self.lock:
+            fetched_at, status = self._status_cache
+        if status is None or time.monotonic() - fetched_at >= self.status_ttl:
+            status = self._fetch_status()
+            self._remember_status(status)
+        return status
+
+    def _fetch_status(self):
+        try:
+            sock = self._connect()
+        except Exception as e:
+            logger.error(str(e))
+            return {"free": 0, "waiting": 0}
+        stream = sock.makefile("rwb")
+        try:
+            sock.settimeout(5)
+            _send(stream, {"op": "status"})
+            return _receive(stream)
+        except Exception as e:
+            logger.error(f"Browser broker status failed: {e}")
+            return {"free": 0, "waiting": 0}
+        finally:
+            _close(sock, stream)
+
+    @property
+    def waiting(self):
+        """Callers queued for a driver across all workers"""
+        return self._status()["waiting"]
+
+    def free_capacity(self):
+        return self._status()["free"]
+
+    def get_driver(self, timeout=30, work_class=INTERACTIVE, deadline=None):
+        """Lease a driver from the broker, queueing by work class and deadline"""
+        sock = self._connect()
+        stream = sock.makefile("rwb")
+        try:
+            sock.settimeout(timeout + 10)
+            _send(stream, {
+                "op": "lease",
+                "timeout": timeout,
+                "work_class": work_class,
+                "deadline": deadline,
+                "worker": os.getpid(),
+            })
+            reply = _receive(stream)
+            if not reply["ok"]:
+                if reply.get("timeout"):
+                    raise TimeoutError(reply["error"])
+                raise Exception(f"Browser broker could not lease a driver: {reply['error']}")
+            driver = _leased_driver_class()(reply["executor"], reply["session_id"], reply["capabilities"])
+            if "status" in reply:
+                self._remember_status(reply["status"])
+        except BaseException:
+            _close(sock, stream)
+            raise
+        sock.settimeout(None)
+        with self.lock:
+            self.leases[driver] = (sock, stream)
+        return driver
+
+    def return_driver(self, driver, healthy=True):
+        """End the lease; the broker resets the session and hands it to the next caller"""
+        with self.lock:
+            sock, stream = self.leases.pop(driver, (None, None))
+        if sock is None:
+            return
+        try:
+            sock.settimeout(30)
+            _send(stream, {"op": "release", "healthy": healthy})
+            _receive(stream)
+        except Exception as e:
+            logger.error(f"Error returning leased driver: {e}")
+        finally:
+            _close(sock, stream)
+            try:
+                driver.command_executor.close()
+            except Exception:
+                pass
+
+    def _cleanup_driver(self, driver):
+        self.return_driver(driver, healthy=False)
+
+    def cleanup_all(self):
+        """Give back any leases still held; the browsers stay with the broker"""
+        with self.lock:
+            drivers = list(self.leases)
+        for driver in drivers:
+            self.return_driver(driver)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=os.environ.get("BROWSER_BROKER_SOCKET") or DEFAULT_SOCKET)
+    parser.add_argument("--lease-seconds", type=int, default=int(os.environ.get("BROKER_LEASE_SECONDS", "360")),
+                        help="reclaim a session held longer than this")
+    parser.add_argument("--warm", type=int, default=int(os.environ.get("BROKER_WARM_DRIVERS", "1")),
+                        help="browsers to start before the first lease")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # The pool is configured exactly as the app would run it in-process, without
+    # importing the app itself (Flask, executors, and a BrokerPool of its own)
+    from webdriver_pool import build_local_pool
+
+    pool = build_local_pool()
+    server = BrokerServer(pool, args.socket, args.lease_seconds)
+
+    def stop(signum, frame):
+        logger.info("Browser broker shutting down")
+        server.shutdown()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    if args.warm:
+        threading.Thread(target=server.warm, args=(args.warm,), name="broker-warm", daemon=True).start()
+    try:
+        server.serve_forever()
+    finally:
+        pool.cleanup_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
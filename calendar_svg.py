@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+CELL = 18
+GAP = 2
+MONTH_GUTTER = 10
+LABEL_HEIGHT = 16
+WEEKDAY_HEIGHT = 12
+
+STATUS_CLASSES = {1: "p", -1: "a", 0: "h"}
+
+STYLE = (
+    ".att-cal .h{fill:#fff;stroke:#ddd}"
+    ".att-cal .p{fill:#2ecc71}"
+    ".att-cal .a{fill:#e74c3c}"
+    ".att-cal text{font:9px sans-serif;fill:#333;text-anchor:middle}"
+    ".att-cal .m{font:bold 11px sans-serif;text-anchor:start}"
+    ".att-cal .w{fill:#999}"
+)
+
+
+def _month_starts(first, last):
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        yield month
+        month = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def _month(month, values):
+    """One month block: label, weekday initials and a Monday-first grid of day cells.
+
+    Cells of each status share a single <path>, keeping the DOM to a handful
+    of nodes per month instead of one element per day.
+    """
+    parts = [f'<text class="m" x="0" y="11">{month.strftime("%b %Y")}</text>']
+    for i, initial in enumerate("MTWTFSS"):
+        parts.append(f'<text class="w" x="{i * (CELL + GAP) + CELL // 2}" y="{LABEL_HEIGHT + 9}">{initial}</text>')
+    top = LABEL_HEIGHT + WEEKDAY_HEIGHT
+    cells = {status: [] for status in STATUS_CLASSES.values()}
+    labels = []
+    day = month
+    row = 0
+    while day.month == month.month:
+        x = day.weekday() * (CELL + GAP)
+        y = top + row * (CELL + GAP)
+        cells[STATUS_CLASSES[values.get(day, 0)]].append(f"M{x} {y}h{CELL}v{CELL}h-{CELL}z")
+        labels.append(f'<text x="{x + CELL // 2}" y="{y + 12}">{day.day}</text>')
+        day += timedelta(days=1)
+        if day.weekday() == 0:
+            row += 1
+    for status, path in cells.items():
+        if path:
+            parts.append(f'<path class="{status}" d="{"".join(path)}"/>')
+    return "".join(parts + labels)
+
+
+def render_calendar(calendar_data, today=None, months_per_row=4):
+    """Inline SVG heatmap of `calendar_data` ({"date": ISO, "value": 1|-1|0} entries).
+
+    Covers every month from the first recorded day up to `today`'s month;
+    days without an entry are drawn as days without classes. Returns None
+    when there is nothing to draw.
+    """
+    if not calendar_data:
+        return None
+    values = {date.fromisoformat(entry["date"][:10]): entry["value"] for entry in calendar_data}
+    today = today or date.today()
+    months = list(_month_starts(min(values), max(max(values), today)))
+
+    month_width = 7 * (CELL + GAP) - GAP
+    month_height = LABEL_HEIGHT + WEEKDAY_HEIGHT + 6 * (CELL + GAP) - GAP
+    columns = min(len(months), months_per_row)
+    rows = -(-len(months) // months_per_row)
+    width = columns * month_width + (columns - 1) * MONTH_GUTTER
+    height = rows * month_height + (rows - 1) * MONTH_GUTTER
+
+    blocks = []
+    for i, month in enumerate(months):
+        x = (i % months_per_row) * (month_width + MONTH_GUTTER)
+        y = (i // months_per_row) * (month_height + MONTH_GUTTER)
+        blocks.append(f'<g transform="translate({x},{y})">{_month(month, values)}</g>')
+
+    return (
+        f'<svg class="att-cal" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'width="100%" style="max-width:{width}px" role="img" aria-label="Attendance calendar">'
+        f'<style>{STYLE}</style>{"".join(blocks)}</svg>'
+    )
+
+
+class CalendarCache:
+    """Rendered calendars by key (user, data version, month), so an unchanged result is drawn once"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, build):
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        svg = build()
+        with self.lock:
+            self.cache[key] = svg
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return svg
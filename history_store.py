@@ -0,0 +1,110 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from attendance_index import AttendanceIndex
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance_days (
+    username TEXT NOT NULL,
+    course TEXT NOT NULL,
+    day TEXT NOT NULL,
+    present INTEGER NOT NULL,
+    absent INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (username, course, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS attendance_days_user_day ON attendance_days (username, day);
+CREATE TABLE IF NOT EXISTS courses (
+    username TEXT NOT NULL,
+    course TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (username, course)
+) WITHOUT ROWID;
+"""
+
+
+class HistoryStore:
+    """Durable per-course, per-day attendance history in SQLite.
+
+    Each scrape is normalised into (username, course, day) rows with the
+    present/absent counts for that day. Rows are upserted, and a row is only
+    rewritten when its counts change, so re-storing an unchanged semester is
+    a read-only pass over the primary key. Days are stored as ISO dates so
+    per-user and per-course scans come back in date order from the index.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        # WAL lets page renders read while a scrape result is being written
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+        self._local.conn = conn
+        return conn
+
+    def record(self, username, data):
+        """Store a parsed attendance result, returns the number of days that changed"""
+        now = time.time()
+        rows = [
+            (username, course, day.isoformat(), present, absent, now)
+            for course, day, present, absent in AttendanceIndex.from_result(data).records()
+        ]
+        names = [(username, code, sub["name"]) for code, sub in data.get("subjects", {}).items()]
+
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO courses (username, course, name) VALUES (?, ?, ?) "
+                "ON CONFLICT (username, course) DO UPDATE SET name = excluded.name "
+                "WHERE name != excluded.name",
+                names,
+            )
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO attendance_days (username, course, day, present, absent, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (username, course, day) DO UPDATE SET "
+                "present = excluded.present, absent = excluded.absent, updated_at = excluded.updated_at "
+                "WHERE present != excluded.present OR absent != excluded.absent",
+                rows,
+            )
+            changed = conn.total_changes - before
+        if changed:
+            logger.info(f"History updated for {username}: {changed} of {len(rows)} course-days changed")
+        return changed
+
+    def daily_totals(self, username):
+        """[(day, present, absent)] summed over courses, oldest first"""
+        return self._connect().execute(
+            "SELECT day, SUM(present), SUM(absent) FROM attendance_days "
+            "WHERE username = ? GROUP BY day ORDER BY day",
+            (username,),
+        ).fetchall()
+
+    def course_history(self, username, course):
+        """[(day, present, absent)] for one course, oldest first"""
+        return self._connect().execute(
+            "SELECT day, present, absent FROM attendance_days "
+            "WHERE username = ? AND course = ? ORDER BY day",
+            (username, course),
+        ).fetchall()
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional dependency, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/html", "application/json", "text/css", "text/javascript", "image/svg+xml")
+
+
+def data_version(data):
+    """Stable short hash of a JSON-serialisable payload, ignoring any stamped version"""
+    payload = {k: v for k, v in data.items() if k != "version"}
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def make_etag(*parts):
+    """ETag value for a response built from the given inputs"""
+    return hashlib.sha256("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:24]
+
+
+def _accepted_encoding(accept_encoding):
+    accepted = {token.split(";")[0].strip().lower() for token in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class ResponseCompressor:
+    """Compresses text responses above a size threshold.
+
+    Bodies of responses that carry an ETag are the same for as long as the
+    ETag is, so their compressed form is kept in a small LRU keyed by
+    (ETag, encoding) and unchanged pages are never compressed twice.
+    """
+
+    def __init__(self, min_size=1024, max_entries=256, gzip_level=6, brotli_quality=5):
+        self.min_size = min_size
+        self.max_entries = max_entries
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _compress(self, body, encoding):
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    def _cached(self, key, body, encoding):
+        if key is None:
+            return self._compress(body, encoding)
+        with self.lock:
+            compressed = self.cache.get(key)
+            if compressed is not None:
+                self.cache.move_to_end(key)
+                return compressed
+        compressed = self._compress(body, encoding)
+        with self.lock:
+            self.cache[key] = compressed
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return compressed
+
+    def process(self, response, accept_encoding):
+        """Compress `response` in place if the client and content allow it"""
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = _accepted_encoding(accept_encoding or "")
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        etag, _ = response.get_etag()
+        key = (etag, encoding) if etag else None
+        response.set_data(self._cached(key, body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
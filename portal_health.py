@@ -0,0 +1,104 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PortalHealth:
+    """Circuit breaker and latency tracker for the Samvidha portal.
+
+    Each scrape step reports how long it took. Timeouts for the next scrape are
+    derived from the observed p95 of that step, so a healthy portal fails fast
+    and a slow one still gets enough time. After `failure_threshold` consecutive
+    failures the breaker opens and callers are told to skip the portal; after
+    `open_seconds` a single probe request is let through (half-open) and its
+    outcome decides whether the breaker closes again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, open_seconds=60, window=50,
+                 timeout_multiplier=2.0, min_timeout=3.0, max_timeout=30.0, min_samples=5):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.window = window
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self.latencies = {}
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started = None
+        self.lock = threading.Lock()
+
+    def record_latency(self, step, seconds):
+        with self.lock:
+            samples = self.latencies.get(step)
+            if samples is None:
+                samples = deque(maxlen=self.window)
+                self.latencies[step] = samples
+            samples.append(seconds)
+
+    def percentile(self, step, pct):
+        """Nearest-rank percentile of recent latencies for a step, or None"""
+        with self.lock:
+            samples = sorted(self.latencies.get(step, ()))
+        if len(samples) < self.min_samples:
+            return None
+        rank = max(0, math.ceil(pct / 100.0 * len(samples)) - 1)
+        return samples[rank]
+
+    def timeout_for(self, step, default):
+        """Adaptive timeout for a step: p95 x multiplier, clamped"""
+        p95 = self.percentile(step, 95)
+        if p95 is None:
+            return default
+        return min(self.max_timeout, max(self.min_timeout, p95 * self.timeout_multiplier))
+
+    def allow_request(self):
+        """False while the breaker is open; lets one probe through when half-open"""
+        with self.lock:
+            now = time.time()
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.open_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_started = now
+                logger.info("Portal circuit half-open, sending probe request")
+                return True
+            # Half-open: only one probe at a time, but don't wait forever on a lost probe
+            if self.probe_started is None or now - self.probe_started > self.open_seconds:
+                self.probe_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != self.CLOSED:
+                logger.info("Portal circuit closed, portal is responding again")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.probe_started = None
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Portal circuit opened after {self.consecutive_failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self.probe_started = None
+
+    def is_open(self):
+        with self.lock:
+            return self.state != self.CLOSED
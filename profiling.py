@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+class SamplingProfiler:
+    """Low-overhead wall-clock sampler built on sys._current_frames().
+
+    A daemon thread wakes every `interval` seconds and records the stack of
+    every other live thread, keyed by thread name, so work handed to executor
+    threads (scrapes, PDF conversion) is captured along with the request
+    thread. Samples from unrelated concurrent requests are captured too; the
+    thread names tell them apart.
+    """
+
+    def __init__(self, interval=0.005, max_depth=128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = {}
+        self.started = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.reverse()
+                name = names.get(ident, str(ident))
+                self.samples.setdefault(name, Counter())[tuple(stack)] += 1
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed-stack format, one "thread;frame;frame count" line per stack"""
+        lines = []
+        for thread_name, stacks in self.samples.items():
+            for stack, count in stacks.items():
+                frames = [thread_name] + [f"{name} ({os.path.basename(path)}:{line})" for name, path, line in stack]
+                lines.append(f"{';'.join(frames)} {count}")
+        return "".join(line + "\n" for line in lines)
+
+    def speedscope(self, name):
+        """speedscope's sampled-profile JSON, one profile per thread"""
+        frames = []
+        frame_index = {}
+        profiles = []
+        for thread_name, stacks in self.samples.items():
+            samples = []
+            weights = []
+            for stack, count in stacks.items():
+                indexes = []
+                for frame in stack:
+                    if frame not in frame_index:
+                        frame_index[frame] = len(frames)
+                        frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                    indexes.append(frame_index[frame])
+                samples.append(indexes)
+                weights.append(count * self.interval)
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            })
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "profiling.py",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+class ProfileStore:
+    """Writes profiles to a directory and keeps only the newest `keep` of them"""
+
+    def __init__(self, directory, keep=50):
+        self.directory = directory
+        self.keep = keep
+        self.lock = threading.Lock()
+
+    def save(self, profiler, label):
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"{int(now * 1000) % 1000:03d}"
+        safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in label).strip("_")[:60]
+        base = f"{stamp}-{int(profiler.duration * 1000)}ms-{safe_label}"
+        with open(os.path.join(self.directory, base + ".speedscope.json"), "w") as f:
+            json.dump(profiler.speedscope(label), f)
+        with open(os.path.join(self.directory, base + ".collapsed.txt"), "w") as f:
+            f.write(profiler.collapsed())
+        self._rotate()
+        logger.info(f"Saved profile {base} ({profiler.duration:.2f}s)")
+        return base
+
+    def _rotate(self):
+        with self.lock:
+            profiles = self.list()
+            for entry in profiles[self.keep:]:
+                for filename in entry["files"]:
+                    try:
+                        os.unlink(os.path.join(self.directory, filename))
+                    except OSError:
+                        pass
+
+    def list(self):
+        """Saved profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = {}
+        for filename in os.listdir(self.directory):
+            base = filename.split(".", 1)[0]
+            entry = entries.setdefault(base, {"name": base, "files": [], "mtime": 0.0})
+            entry["files"].append(filename)
+            entry["mtime"] = max(entry["mtime"], os.path.getmtime(os.path.join(self.directory, filename)))
+        return sorted(entries.values(), key=lambda e: e["mtime"], reverse=True)
@@ -0,0 +1,54 @@
+import math
+from fractions import Fraction
+
+DEFAULT_THRESHOLD = 75.0
+
+
+def classes_needed(present, absent, threshold=DEFAULT_THRESHOLD):
+    """Fewest consecutive classes to attend to reach `threshold` percent"""
+    t = Fraction(str(threshold))
+    if t >= 100:
+        return 0 if absent == 0 else None
+    needed = (t * (present + absent) - 100 * present) / (100 - t)
+    return max(0, math.ceil(needed))
+
+
+def classes_skippable(present, absent, threshold=DEFAULT_THRESHOLD):
+    """Most classes that can be missed while staying at or above `threshold` percent"""
+    t = Fraction(str(threshold))
+    if t <= 0:
+        return None
+    spare = (100 * present - t * (present + absent)) / t
+    return max(0, math.floor(spare))
+
+
+def project(present, absent, max_k=50, threshold=DEFAULT_THRESHOLD):
+    """Percentage after skipping or attending k more classes, for k = 0..max_k"""
+    total = present + absent
+    skip = []
+    attend = []
+    for k in range(max_k + 1):
+        skip.append(round(present / (total + k) * 100, 2) if total + k else 0.0)
+        attend.append(round((present + k) / (total + k) * 100, 2) if total + k else 0.0)
+    return {
+        "present": present,
+        "absent": absent,
+        "skip": skip,
+        "attend": attend,
+        "needed": classes_needed(present, absent, threshold),
+        "can_skip": classes_skippable(present, absent, threshold),
+    }
+
+
+def build_projection(data, max_k=50, threshold=DEFAULT_THRESHOLD):
+    """What-if table for the overall figures and every subject, sent to the page once as JSON"""
+    overall = data.get("overall", {})
+    return {
+        "threshold": threshold,
+        "max_k": max_k,
+        "overall": project(overall.get("present", 0), overall.get("absent", 0), max_k, threshold),
+        "subjects": {
+            code: dict(project(sub["present"], sub["absent"], max_k, threshold), name=sub["name"])
+            for code, sub in data.get("subjects", {}).items()
+        },
+    }
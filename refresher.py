@@ -0,0 +1,133 @@
+import logging
+import random
+import threading
+import time
+
+from throttle import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundRefresher:
+    """Keeps cached attendance warm for recently active users.
+
+    Users are tracked in memory when they hit the app. A single daemon thread
+    re-scrapes the ones whose cache entry is about to expire, paced by a token
+    bucket with random jitter, and backs off whenever interactive requests are
+    waiting for a driver.
+    """
+
+    def __init__(self, refresh_fn, is_busy, active_days=3, cache_ttl=1800,
+                 refresh_margin=300, refreshes_per_minute=1.0, burst=1,
+                 jitter=20, poll_interval=30):
+        self.refresh_fn = refresh_fn
+        self.is_busy = is_busy
+        self.active_seconds = active_days * 86400
+        self.cache_ttl = cache_ttl
+        self.refresh_margin = refresh_margin
+        self.jitter = jitter
+        self.poll_interval = poll_interval
+        self.bucket = TokenBucket(refreshes_per_minute / 60.0, burst)
+        self.users = {}
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def touch(self, username, password, refreshed_at=None):
+        """Record activity for a user whose credentials were just verified, starting the worker on first use.
+
+        `refreshed_at` is when their cached attendance was written; a user seen
+        for the first time without it is assumed to have just been scraped.
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.users.get(username)
+            if entry is None:
+                entry = {"refreshed_at": now if refreshed_at is None else refreshed_at}
+                self.users[username] = entry
+            elif refreshed_at is not None:
+                entry["refreshed_at"] = max(entry["refreshed_at"], refreshed_at)
+            entry["password"] = password
+            entry["last_seen"] = now
+        self.start()
+
+    def seen(self, username):
+        """Extend an already tracked user's activity window without touching their credentials"""
+        with self.lock:
+            entry = self.users.get(username)
+            if entry is not None:
+                entry["last_seen"] = time.time()
+
+    def mark_fresh(self, username):
+        """Note that the user's cache entry was just written"""
+        with self.lock:
+            entry = self.users.get(username)
+            if entry is not None:
+                entry["refreshed_at"] = time.time()
+
+    def forget(self, username):
+        with self.lock:
+            self.users.pop(username, None)
+
+    def start(self):
+        # Started lazily so a --preload master never owns the thread
+        if self._thread and self._thread.is_alive():
+            return
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="attendance-refresher", daemon=True)
+            self._thread.start()
+            logger.info("Background refresher started")
+
+    def stop(self):
+        self._stop.set()
+
+    def _due_users(self, now):
+        """Active users whose cache expires within the refresh margin, oldest first"""
+        due = []
+        with self.lock:
+            for username, entry in list(self.users.items()):
+                if now - entry["last_seen"] > self.active_seconds:
+                    self.users.pop(username, None)
+                    continue
+                age = now - entry["refreshed_at"]
+                if age >= self.cache_ttl - self.refresh_margin:
+                    due.append((entry["refreshed_at"], username, entry["password"]))
+        due.sort()
+        return [(username, password) for _, username, password in due]
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval + random.uniform(0, self.jitter)):
+            try:
+                self._refresh_due()
+            except Exception as e:
+                logger.error(f"Background refresh cycle failed: {e}")
+
+    def _refresh_due(self):
+        for username, password in self._due_users(time.time()):
+            if self.is_busy():
+                logger.info("Pool under interactive load, pausing background refresh")
+                return
+            if not self.bucket.try_acquire():
+                return
+
+            # Spread refreshes out so they never arrive as a burst
+            if self._stop.wait(random.uniform(0, self.jitter)):
+                return
+            if self.is_busy():
+                return
+
+            started = time.time()
+            try:
+                ok = self.refresh_fn(username, password)
+            except Exception as e:
+                logger.error(f"Background refresh failed for user {username}: {e}")
+                ok = False
+            if ok:
+                self.mark_fresh(username)
+                logger.info(f"Background refreshed user {username} in {time.time() - started:.1f}s")
+            else:
+                # Bad credentials or portal trouble: stop tracking until next visit
+                self.forget(username)
@@ -0,0 +1,104 @@
+import itertools
+import logging
+import math
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Work classes, most urgent first
+UPLOAD = 0
+INTERACTIVE = 1
+LAB_METADATA = 2
+BACKGROUND = 3
+
+CLASS_NAMES = {
+    UPLOAD: "upload",
+    INTERACTIVE: "interactive",
+    LAB_METADATA: "lab metadata",
+    BACKGROUND: "background",
+}
+
+
+class _Waiter:
+    __slots__ = ("work_class", "deadline", "enqueued", "seq")
+
+    def __init__(self, work_class, deadline, seq):
+        self.work_class = work_class
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.seq = seq
+
+
+class DriverScheduler:
+    """Admits callers to the WebDriver pool in priority order.
+
+    There are `capacity` slots, one per pooled driver. When a slot is free it
+    goes to the waiting caller with the most urgent class; within a class,
+    the earliest deadline wins (uploads pass the lab's submission date), then
+    arrival order. A waiter moves up one class for every `aging_seconds` it
+    has waited so background work is never starved, and `caps` limits how
+    many slots a class may hold at once.
+    """
+
+    def __init__(self, capacity, caps=None, aging_seconds=10):
+        self.capacity = capacity
+        self.caps = caps or {}
+        self.aging_seconds = aging_seconds
+        self.in_use = 0
+        self.running = {work_class: 0 for work_class in CLASS_NAMES}
+        self.waiters = []
+        self.cond = threading.Condition()
+        self._seq = itertools.count()
+
+    @property
+    def waiting(self):
+        return len(self.waiters)
+
+    def _effective_class(self, waiter, now):
+        if not self.aging_seconds:
+            return waiter.work_class
+        aged = int((now - waiter.enqueued) // self.aging_seconds)
+        return max(UPLOAD, waiter.work_class - aged)
+
+    def _eligible(self, waiter):
+        cap = self.caps.get(waiter.work_class, self.capacity)
+        return self.in_use < self.capacity and self.running[waiter.work_class] < cap
+
+    def _next_waiter(self):
+        now = time.monotonic()
+        eligible = [w for w in self.waiters if self._eligible(w)]
+        if not eligible:
+            return None
+        return min(eligible, key=lambda w: (
+            self._effective_class(w, now),
+            w.deadline if w.deadline is not None else math.inf,
+            w.seq,
+        ))
+
+    def acquire(self, work_class=INTERACTIVE, deadline=None, timeout=30):
+        """Block until this caller may take a driver; raises TimeoutError"""
+        with self.cond:
+            waiter = _Waiter(work_class, deadline, next(self._seq))
+            self.waiters.append(waiter)
+            give_up = time.monotonic() + timeout
+            try:
+                while self._next_waiter() is not waiter:
+                    remaining = give_up - time.monotonic()
+                    if remaining <= 0:
+                        logger.warning(f"Timed out waiting for a driver ({CLASS_NAMES[work_class]})")
+                        raise TimeoutError("No WebDriver available within timeout")
+                    # Wake periodically as well, since aging can change the order
+                    self.cond.wait(min(remaining, self.aging_seconds or remaining))
+                self.in_use += 1
+                self.running[work_class] += 1
+            finally:
+                self.waiters.remove(waiter)
+                self.cond.notify_all()
+
+    def release(self, work_class):
+        with self.cond:
+            self.in_use -= 1
+            self.running[work_class] -= 1
+            self.cond.notify_all()
@@ -0,0 +1,106 @@
+from attendance_delta import MAX_CHANGES, advance, changes_since, diff_attendance
+from http_cache import data_version
+
+
+def _result(days):
+    """Parsed-result stand-in from {course: {"DD-MM-YYYY": (present, absent)}}"""
+    subjects = {}
+    per_course = {}
+    for course, rows in days.items():
+        present = sum(p for p, _ in rows.values())
+        absent = sum(a for _, a in rows.values())
+        subjects[course] = {"name": course, "present": present, "absent": absent}
+        per_course[course] = {day: {"present": p, "absent": a} for day, (p, a) in rows.items()}
+    data = {"subjects": subjects, "overall": {}, "per_course_date_attendance": per_course}
+    data["version"] = data_version(data)
+    return data
+
+
+def _history(*results):
+    """Log after storing each result in turn"""
+    log, previous = None, None
+    for data in results:
+        log = advance(log, previous, data)
+        previous = data
+    return log
+
+
+def test_diff_reports_added_changed_and_removed_days():
+    old = _result({"CS101": {"01-07-2024": (1, 0), "02-07-2024": (1, 0)}, "MA101": {"01-07-2024": (0, 1)}})
+    new = _result({"CS101": {"01-07-2024": (1, 0), "02-07-2024": (0, 1), "03-07-2024": (1, 0)}})
+
+    diff = diff_attendance(old, new)
+
+    assert set(diff["subjects"]) == {"CS101"}
+    assert diff["removed"] == ["MA101"]
+    assert diff["days"] == [["CS101", "2024-07-02", 0, 1], ["CS101", "2024-07-03", 1, 0]]
+    assert diff["removed_days"] == [["MA101", "2024-07-01"]]
+
+
+def test_advance_bumps_the_revision_only_when_the_data_changes():
+    first = _result({"CS101": {"01-07-2024": (1, 0)}})
+    log = advance(None, None, first)
+    assert log["changes"] == []
+
+    assert advance(log, first, dict(first)) is log
+
+    second = _result({"CS101": {"01-07-2024": (1, 0), "02-07-2024": (1, 0)}})
+    bumped = advance(log, first, second)
+    assert bumped["revision"] == log["revision"] + 1
+    assert bumped["version"] == second["version"]
+    assert bumped["changes"][-1]["revision"] == bumped["revision"]
+
+
+def test_changes_since_merges_revisions_including_removed_days():
+    v1 = _result({"CS101": {"01-07-2024": (1, 0), "02-07-2024": (1, 0)}})
+    v2 = _result({"CS101": {"01-07-2024": (1, 0), "03-07-2024": (1, 0)}})
+    v3 = _result({"CS101": {"01-07-2024": (1, 0), "02-07-2024": (0, 1), "03-07-2024": (1, 0)}})
+    v4 = _result({"CS101": {"01-07-2024": (1, 0), "02-07-2024": (0, 1)}})
+    log = _history(v1, v2, v3, v4)
+    base = log["revision"] - 3
+
+    delta = changes_since(log, v4, base)
+    assert delta["full"] is False and delta["changed"] is True
+    assert delta["version"] == log["revision"]
+    # 02-07 was removed then came back; 03-07 was added then removed
+    assert delta["days"] == [["CS101", "2024-07-02", 0, 1]]
+    assert delta["removed_days"] == [["CS101", "2024-07-03"]]
+
+    latest = changes_since(log, v4, base + 2)
+    assert latest["days"] == []
+    assert latest["removed_days"] == [["CS101", "2024-07-03"]]
+
+
+def test_up_to_date_client_gets_no_changes():
+    data = _result({"CS101": {"01-07-2024": (1, 0)}})
+    log = advance(None, None, data)
+    assert changes_since(log, data, log["revision"]) == {"version": log["revision"], "full": False, "changed": False}
+
+
+def test_first_request_gets_a_plain_snapshot():
+    data = _result({"CS101": {"01-07-2024": (1, 0)}})
+    log = advance(None, None, data)
+    reply = changes_since(log, data, None)
+    assert reply["full"] is True
+    assert reply["snapshot_required"] is False
+    assert reply["days"] == [["CS101", "2024-07-01", 1, 0]]
+
+
+def test_versions_the_log_cannot_continue_from_require_a_snapshot():
+    results = [_result({"CS101": {f"{day:02d}-07-2024": (1, 0) for day in range(1, n + 2)}})
+               for n in range(MAX_CHANGES + 2)]
+    log = _history(*results)
+    first_kept = log["changes"][0]["revision"]
+
+    assert changes_since(log, results[-1], first_kept - 1)["full"] is False
+    too_old = changes_since(log, results[-1], first_kept - 2)
+    assert too_old["full"] is True and too_old["snapshot_required"] is True
+
+    # A restarted log (cache lost) begins at a new base with no changes behind it
+    restarted = advance(None, None, results[-1])
+    restarted["revision"] = log["revision"] + 100
+    stale = changes_since(restarted, results[-1], log["revision"])
+    assert stale["snapshot_required"] is True
+
+    ahead = changes_since(log, results[-1], log["revision"] + 1)
+    assert ahead["snapshot_required"] is True
@@ -0,0 +1,139 @@
+import random
+from datetime import date, timedelta
+
+from attendance_index import AttendanceIndex
+
+RECORDS = [
+    ("CS101", date(2024, 7, 1), 1, 0),  # Monday
+    ("CS101", date(2024, 7, 3), 0, 1),
+    ("MA101", date(2024, 7, 3), 2, 0),
+    ("CS101", date(2024, 7, 8), 1, 0),
+    ("MA101", date(2024, 7, 10), 0, 2),
+]
+
+
+def _legacy_date_dicts(records):
+    """The date_attendance / per_course_date_attendance dicts the parser used to return"""
+    totals, per_course = {}, {}
+    for course, day, present, absent in records:
+        key = day.strftime("%d-%m-%Y")
+        for counts in (totals.setdefault(key, {"present": 0, "absent": 0}),
+                       per_course.setdefault(course, {}).setdefault(key, {"present": 0, "absent": 0})):
+            counts["present"] += present
+            counts["absent"] += absent
+    return totals, per_course
+
+
+def _legacy_streak(date_attendance):
+    """Streak as calculate_attendance_percentage computed it from the date dicts"""
+    streak = 0
+    for key in sorted(date_attendance, key=lambda k: (k[6:], k[3:5], k[:2]), reverse=True):
+        if date_attendance[key]["present"] > 0:
+            streak += 1
+        else:
+            break
+    return streak
+
+
+def test_from_records_lays_days_out_from_the_first_date():
+    index = AttendanceIndex.from_records(reversed(RECORDS))
+    assert index.start == date(2024, 7, 1)
+    assert index.days == 10
+    assert sorted(index.records()) == sorted(RECORDS)
+    assert list(index.records("MA101")) == [r for r in RECORDS if r[0] == "MA101"]
+
+
+def test_empty_index():
+    index = AttendanceIndex.from_records([])
+    assert list(index.records()) == []
+    assert index.streak() == 0
+    assert index.weekly() == []
+    assert index.range_totals() == (0, 0)
+    assert AttendanceIndex.from_json(index.to_json()).days == 0
+
+
+def test_json_round_trip_keeps_counts_and_unmarked_days():
+    records = RECORDS + [("CS101", date(2024, 7, 9), 0, 0)]
+    index = AttendanceIndex.from_records(records)
+    restored = AttendanceIndex.from_json(index.to_json())
+    assert sorted(restored.records()) == sorted(index.records())
+    assert restored.unmarked == {"CS101": {8}}
+    assert restored.streak() == index.streak() == 0
+
+
+def test_from_result_reads_legacy_date_dicts():
+    _, per_course = _legacy_date_dicts(RECORDS)
+    per_course["CS101"]["not a date"] = {"present": 1, "absent": 0}
+    index = AttendanceIndex.from_result({"per_course_date_attendance": per_course})
+    assert sorted(index.records()) == sorted(RECORDS)
+    assert AttendanceIndex.from_result({"day_index": index.to_json()}).days == index.days
+
+
+def test_streak_counts_back_from_the_latest_class_day():
+    index = AttendanceIndex.from_records([
+        ("CS101", date(2024, 7, 1), 0, 1),
+        ("CS101", date(2024, 7, 2), 1, 0),
+        ("MA101", date(2024, 7, 4), 1, 1),
+        ("CS101", date(2024, 7, 5), 1, 0),
+    ])
+    assert index.streak() == 3
+    assert index.streak("CS101") == 2
+    assert index.streak("MA101") == 1
+
+
+def test_held_but_unmarked_class_ends_the_streak():
+    index = AttendanceIndex.from_records([
+        ("CS101", date(2024, 7, 1), 1, 0),
+        ("CS101", date(2024, 7, 2), 0, 0),
+        ("CS101", date(2024, 7, 3), 1, 0),
+    ])
+    assert index.streak() == 1
+    assert index.attended_days() == 2
+    assert index.absent_days() == 0
+
+
+def test_streak_and_day_counts_match_the_legacy_calculation():
+    rng = random.Random(7)
+    for _ in range(200):
+        records = [
+            (rng.choice(["CS101", "MA101", "PH101"]),
+             date(2024, 7, 1) + timedelta(days=rng.randrange(30)),
+             rng.choice([0, 0, 1, 2]), rng.choice([0, 0, 1]))
+            for _ in range(rng.randrange(1, 40))
+        ]
+        date_attendance, _ = _legacy_date_dicts(records)
+        index = AttendanceIndex.from_json(AttendanceIndex.from_records(records).to_json())
+        assert index.streak() == _legacy_streak(date_attendance), records
+        assert index.attended_days() == sum(1 for c in date_attendance.values() if c["present"] > 0)
+        assert index.absent_days() == sum(1 for c in date_attendance.values() if not c["present"] and c["absent"])
+
+
+def test_weekly_groups_by_monday():
+    index = AttendanceIndex.from_records(RECORDS)
+    assert index.weekly() == [(date(2024, 7, 1), 3, 1), (date(2024, 7, 8), 1, 2)]
+    assert index.weekly("MA101") == [(date(2024, 7, 1), 2, 0), (date(2024, 7, 8), 0, 2)]
+
+
+def test_weekly_starts_on_the_monday_before_a_midweek_start():
+    index = AttendanceIndex.from_records([("CS101", date(2024, 7, 4), 1, 0), ("CS101", date(2024, 7, 8), 0, 1)])
+    assert index.weekly() == [(date(2024, 7, 1), 1, 0), (date(2024, 7, 8), 0, 1)]
+
+
+def test_calendar_marks_attended_and_absent_only_days():
+    index = AttendanceIndex.from_records(RECORDS)
+    assert index.calendar() == [
+        {"date": "2024-07-01", "value": 1},
+        {"date": "2024-07-03", "value": 1},
+        {"date": "2024-07-08", "value": 1},
+        {"date": "2024-07-10", "value": -1},
+    ]
+
+
+def test_range_totals_are_inclusive_and_clamped():
+    index = AttendanceIndex.from_records(RECORDS)
+    assert index.range_totals() == (4, 3)
+    assert index.range_totals(date(2024, 7, 3), date(2024, 7, 8)) == (3, 1)
+    assert index.range_totals(date(2024, 7, 3), date(2024, 7, 3), course="CS101") == (0, 1)
+    assert index.range_totals(date(2024, 6, 1), date(2024, 7, 1)) == (1, 0)
+    assert index.range_totals(date(2024, 8, 1)) == (0, 0)
+    assert index.range_totals(date(2024, 7, 9), date(2024, 7, 2)) == (0, 0)
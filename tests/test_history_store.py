@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+
+from attendance_index import AttendanceIndex
+from history_store import HistoryStore
+
+
+def _result(records, names=None):
+    index = AttendanceIndex.from_records(records)
+    courses = {course for course, *_ in records}
+    return {
+        "subjects": {code: {"name": (names or {}).get(code, code)} for code in courses},
+        "day_index": index.to_json(),
+    }
+
+
+RECORDS = [
+    ("CS101", date(2024, 7, 1), 1, 0),
+    ("MA101", date(2024, 7, 1), 0, 1),
+    ("CS101", date(2024, 7, 2), 2, 0),
+    ("MA101", date(2024, 7, 3), 1, 1),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path / "history" / "attendance.db"))
+
+
+def test_record_stores_every_course_day(store):
+    assert store.record("alice", _result(RECORDS)) == 4
+    assert store.course_history("alice", "CS101") == [("2024-07-01", 1, 0), ("2024-07-02", 2, 0)]
+    assert store.course_history("alice", "MA101") == [("2024-07-01", 0, 1), ("2024-07-03", 1, 1)]
+
+
+def test_re_recording_is_idempotent(store):
+    store.record("alice", _result(RECORDS))
+    assert store.record("alice", _result(RECORDS)) == 0
+    assert len(store.course_history("alice", "CS101")) == 2
+
+
+def test_re_recording_rewrites_only_corrected_days(store):
+    store.record("alice", _result(RECORDS))
+    corrected = [r if r[1] != date(2024, 7, 2) else ("CS101", date(2024, 7, 2), 1, 1) for r in RECORDS]
+    assert store.record("alice", _result(corrected)) == 1
+    assert store.course_history("alice", "CS101")[-1] == ("2024-07-02", 1, 1)
+
+
+def test_daily_totals_sum_courses_per_day(store):
+    store.record("alice", _result(RECORDS))
+    assert store.daily_totals("alice") == [
+        ("2024-07-01", 1, 1),
+        ("2024-07-02", 2, 0),
+        ("2024-07-03", 1, 1),
+    ]
+
+
+def test_users_are_kept_apart(store):
+    store.record("alice", _result(RECORDS))
+    store.record("bob", _result([("CS101", date(2024, 7, 5), 1, 0)]))
+    assert store.daily_totals("bob") == [("2024-07-05", 1, 0)]
+    assert store.course_history("alice", "PH101") == []
+    assert store.daily_totals("carol") == []
+
+
+def test_history_survives_a_new_store_on_the_same_file(store):
+    store.record("alice", _result(RECORDS))
+    reopened = HistoryStore(store.path)
+    assert reopened.course_history("alice", "CS101") == store.course_history("alice", "CS101")
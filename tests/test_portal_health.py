@@ -0,0 +1,138 @@
+import app
+import portal_health
+from portal_health import PortalHealth
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def _breaker(monkeypatch, **kwargs):
+    clock = _Clock()
+    monkeypatch.setattr(portal_health.time, "time", clock.time)
+    return PortalHealth(**kwargs), clock
+
+
+def test_opens_after_consecutive_failures(monkeypatch):
+    health, clock = _breaker(monkeypatch, failure_threshold=3, open_seconds=60)
+    health.record_failure()
+    health.record_failure()
+    assert health.state == PortalHealth.CLOSED
+    assert health.allow_request()
+
+    health.record_failure()
+    assert health.state == PortalHealth.OPEN
+    assert not health.allow_request()
+
+
+def test_success_resets_the_failure_count(monkeypatch):
+    health, clock = _breaker(monkeypatch, failure_threshold=3)
+    health.record_failure()
+    health.record_failure()
+    health.record_success()
+    health.record_failure()
+    health.record_failure()
+    assert health.state == PortalHealth.CLOSED
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(monkeypatch):
+    health, clock = _breaker(monkeypatch, failure_threshold=1, open_seconds=60)
+    health.record_failure()
+    clock.now += 59
+    assert not health.allow_request()
+
+    clock.now += 1
+    assert health.allow_request()
+    assert health.state == PortalHealth.HALF_OPEN
+    assert not health.allow_request()
+
+    health.record_success()
+    assert health.state == PortalHealth.CLOSED
+    assert health.allow_request()
+
+
+def test_failed_probe_reopens_the_circuit(monkeypatch):
+    health, clock = _breaker(monkeypatch, failure_threshold=5, open_seconds=60)
+    for _ in range(5):
+        health.record_failure()
+    clock.now += 60
+    assert health.allow_request()
+
+    health.record_failure()
+    assert health.state == PortalHealth.OPEN
+    assert not health.allow_request()
+    clock.now += 60
+    assert health.allow_request()
+
+
+def test_lost_probe_is_replaced_after_open_seconds(monkeypatch):
+    health, clock = _breaker(monkeypatch, failure_threshold=1, open_seconds=60)
+    health.record_failure()
+    clock.now += 60
+    assert health.allow_request()
+    clock.now += 61
+    assert health.allow_request()
+
+
+def test_timeouts_follow_p95_within_bounds():
+    health = PortalHealth(min_samples=5, timeout_multiplier=2.0, min_timeout=3.0, max_timeout=30.0)
+    assert health.timeout_for("login", 5) == 5
+    for seconds in (1.0, 1.0, 1.0, 1.0, 2.5):
+        health.record_latency("login", seconds)
+    assert health.timeout_for("login", 5) == 5.0
+    for _ in range(20):
+        health.record_latency("login", 0.1)
+    assert health.timeout_for("login", 5) == 3.0
+    for _ in range(50):
+        health.record_latency("login", 40.0)
+    assert health.timeout_for("login", 5) == 30.0
+
+
+class _RejectingDriver:
+    """Just enough of a WebDriver for a login the portal refuses on the form"""
+
+    class _Element:
+        text = "Invalid username or password"
+
+        def send_keys(self, *args):
+            pass
+
+        def click(self):
+            pass
+
+    class _SwitchTo:
+        @property
+        def alert(self):
+            from selenium.common.exceptions import NoAlertPresentException
+            raise NoAlertPresentException()
+
+    current_url = "https://portal.example/login"
+    switch_to = _SwitchTo()
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def get(self, url):
+        pass
+
+    def find_element(self, by, value):
+        return self._Element()
+
+    def find_elements(self, by, value):
+        return [self._Element()]
+
+
+def test_rejected_login_on_a_probe_closes_the_circuit(monkeypatch):
+    health, clock = _breaker(monkeypatch, failure_threshold=1, open_seconds=60)
+    monkeypatch.setattr(app, "portal_health", health)
+    health.record_failure()
+    clock.now += 60
+    assert health.allow_request()
+
+    assert app._portal_login(_RejectingDriver(), "user", "wrong") is False
+    assert health.state == PortalHealth.CLOSED
+    assert health.allow_request()
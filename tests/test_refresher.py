@@ -0,0 +1,41 @@
+import time
+
+from refresher import BackgroundRefresher
+
+
+def _refresher():
+    refresher = BackgroundRefresher(lambda username, password: True, lambda: False,
+                                    cache_ttl=1800, refresh_margin=300)
+    refresher.start = lambda: None
+    return refresher
+
+
+def test_new_user_is_not_due_right_after_a_scrape():
+    refresher = _refresher()
+    refresher.touch("alice", "pw")
+    refresher.touch("bob", "pw", refreshed_at=time.time() - 60)
+    assert refresher._due_users(time.time()) == []
+
+
+def test_touch_ages_a_new_user_by_their_cache_entry():
+    refresher = _refresher()
+    refresher.touch("alice", "pw", refreshed_at=time.time() - 1600)
+    assert refresher._due_users(time.time()) == [("alice", "pw")]
+
+
+def test_touch_never_moves_refreshed_at_backwards():
+    refresher = _refresher()
+    refresher.touch("alice", "pw")
+    refresher.touch("alice", "pw", refreshed_at=time.time() - 1600)
+    assert refresher._due_users(time.time()) == []
+
+
+def test_seen_only_extends_tracked_users():
+    refresher = _refresher()
+    refresher.seen("mallory")
+    assert "mallory" not in refresher.users
+    refresher.touch("alice", "pw")
+    refresher.users["alice"]["last_seen"] = 0
+    refresher.seen("alice")
+    assert refresher.users["alice"]["last_seen"] > 0
+    assert refresher.users["alice"]["password"] == "pw"
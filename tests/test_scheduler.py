@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from scheduler import BACKGROUND, INTERACTIVE, LAB_METADATA, UPLOAD, DriverScheduler
+
+
+def _wait_for(condition, timeout=2):
+    give_up = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < give_up, "condition not reached"
+        time.sleep(0.005)
+
+
+def _queue(scheduler, order, *requests):
+    """Start one thread per (name, work_class, deadline); each takes a slot, notes it and gives it back"""
+    def run(name, work_class, deadline):
+        scheduler.acquire(work_class, deadline=deadline, timeout=5)
+        order.append(name)
+        scheduler.release(work_class)
+
+    threads = []
+    already_waiting = scheduler.waiting
+    for name, work_class, deadline in requests:
+        thread = threading.Thread(target=run, args=(name, work_class, deadline))
+        thread.start()
+        threads.append(thread)
+        # Enqueue strictly one after another so arrival order is known
+        _wait_for(lambda: scheduler.waiting == already_waiting + len(threads))
+    return threads
+
+
+def test_waiters_are_admitted_by_class_then_deadline_then_arrival():
+    scheduler = DriverScheduler(capacity=1, aging_seconds=0)
+    scheduler.acquire(BACKGROUND)
+    order = []
+    threads = _queue(
+        scheduler, order,
+        ("background", BACKGROUND, None),
+        ("interactive", INTERACTIVE, None),
+        ("upload-late", UPLOAD, 2000),
+        ("upload-early", UPLOAD, 1000),
+        ("interactive-2", INTERACTIVE, None),
+    )
+
+    scheduler.release(BACKGROUND)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["upload-early", "upload-late", "interactive", "interactive-2", "background"]
+    assert scheduler.in_use == 0
+
+
+def test_released_slot_goes_to_most_urgent_waiter():
+    scheduler = DriverScheduler(capacity=2, aging_seconds=0)
+    scheduler.acquire(BACKGROUND)
+    scheduler.acquire(INTERACTIVE)
+    admitted = []
+
+    def run(name, work_class):
+        scheduler.acquire(work_class, timeout=5)
+        admitted.append(name)
+
+    lab = threading.Thread(target=run, args=("lab", LAB_METADATA))
+    lab.start()
+    _wait_for(lambda: scheduler.waiting == 1)
+    upload = threading.Thread(target=run, args=("upload", UPLOAD))
+    upload.start()
+    _wait_for(lambda: scheduler.waiting == 2)
+
+    scheduler.release(BACKGROUND)
+    upload.join(5)
+    assert admitted == ["upload"]
+    assert scheduler.waiting == 1
+
+    scheduler.release(INTERACTIVE)
+    lab.join(5)
+    assert admitted == ["upload", "lab"]
+
+
+def test_aging_promotes_long_waiting_background_work():
+    scheduler = DriverScheduler(capacity=1, aging_seconds=0.05)
+    scheduler.acquire(INTERACTIVE)
+    order = []
+    threads = _queue(scheduler, order, ("background", BACKGROUND, None))
+    # Three aging periods lift background work past interactive requests
+    time.sleep(0.2)
+    threads += _queue(scheduler, order, ("interactive", INTERACTIVE, None))
+
+    scheduler.release(INTERACTIVE)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["background", "interactive"]
+
+
+def test_class_cap_holds_back_work_even_with_free_slots():
+    scheduler = DriverScheduler(capacity=3, caps={BACKGROUND: 1}, aging_seconds=0)
+    scheduler.acquire(BACKGROUND)
+    with pytest.raises(TimeoutError):
+        scheduler.acquire(BACKGROUND, timeout=0.05)
+    scheduler.acquire(INTERACTIVE, timeout=0.05)
+    assert scheduler.waiting == 0
+    assert scheduler.running[BACKGROUND] == 1
+
+
+def test_acquire_times_out_when_no_slot_frees():
+    scheduler = DriverScheduler(capacity=1)
+    scheduler.acquire(INTERACTIVE)
+    with pytest.raises(TimeoutError):
+        scheduler.acquire(UPLOAD, timeout=0.05)
+    assert scheduler.waiting == 0
@@ -0,0 +1,104 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to pace background work"""
+
+    def __init__(self, rate_per_second, capacity, initial=None):
+        self.rate = float(rate_per_second)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity if initial is None else initial)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available, never blocks"""
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def deposit(self, tokens):
+        """Add tokens by hand, e.g. to earn budget per unit of primary work"""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def time_until_available(self, tokens=1):
+        """Seconds until `tokens` could be acquired"""
+        with self.lock:
+            self._refill(time.monotonic())
+            missing = tokens - self.tokens
+            if missing <= 0:
+                return 0.0
+            if self.rate <= 0:
+                return float("inf")
+            return missing / self.rate
+
+
+class KeyedTokenBucket:
+    """One token bucket per key (e.g. per username), pruned when idle"""
+
+    def __init__(self, rate_per_second, capacity, max_keys=10000):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def try_acquire(self, key, tokens=1):
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_keys:
+                    self._prune()
+                bucket = TokenBucket(self.rate, self.capacity)
+                self.buckets[key] = bucket
+        return bucket.try_acquire(tokens)
+
+    def _prune(self):
+        # Buckets that have refilled completely carry no state worth keeping
+        for key, bucket in list(self.buckets.items()):
+            if bucket.time_until_available(bucket.capacity) == 0:
+                del self.buckets[key]
+
+
+class NegativeCache:
+    """Short-lived in-memory set of keys known to fail, e.g. rejected credentials"""
+
+    def __init__(self, ttl_seconds=300, max_entries=10000):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def add(self, key):
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                now = time.monotonic()
+                self.entries = {k: exp for k, exp in self.entries.items() if exp > now}
+                if len(self.entries) >= self.max_entries:
+                    self.entries.pop(next(iter(self.entries)))
+            self.entries[key] = time.monotonic() + self.ttl
+
+    def __contains__(self, key):
+        with self.lock:
+            expires = self.entries.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self.entries[key]
+                return False
+            return True
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
@@ -0,0 +1,114 @@
+import json
+import logging
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+
+class GridNode:
+    """One remote WebDriver endpoint (a Selenium Grid hub or standalone node)"""
+
+    def __init__(self, url, capacity):
+        self.url = url.rstrip("/")
+        self.capacity = capacity
+        self.sessions = 0
+        self.healthy = True
+        self.checked_at = 0.0
+
+    @property
+    def load(self):
+        return self.sessions / self.capacity
+
+    def __repr__(self):
+        return f"GridNode({self.url}, {self.sessions}/{self.capacity}, {'up' if self.healthy else 'down'})"
+
+
+def parse_node_urls(value, default_capacity):
+    """Parse "http://a:4444=4,http://b:4444" into GridNodes; `=N` sets that node's capacity"""
+    nodes = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        url, _, capacity = entry.partition("=")
+        nodes.append(GridNode(url, int(capacity) if capacity else default_capacity))
+    return nodes
+
+
+class RemoteGrid:
+    """Routes new browser sessions to the least-loaded healthy remote node.
+
+    Each node has a fixed number of session slots, counted in this process
+    only. A background thread probes every node's `/status` endpoint each
+    `health_interval` seconds, so acquire() only reads the last result and
+    never waits on the network. A node is taken out of rotation when the
+    probe fails or a session cannot be created on it, until a later probe
+    reports it ready again.
+    """
+
+    def __init__(self, nodes, health_interval=30, status_timeout=3):
+        self.nodes = nodes
+        self.health_interval = health_interval
+        self.status_timeout = status_timeout
+        self.lock = threading.Lock()
+        self._monitor = None
+
+    def total_capacity(self):
+        return sum(node.capacity for node in self.nodes)
+
+    def _probe(self, node):
+        try:
+            with urllib.request.urlopen(f"{node.url}/status", timeout=self.status_timeout) as response:
+                status = json.loads(response.read().decode("utf-8"))
+            ready = bool(status.get("value", {}).get("ready"))
+        except Exception as e:
+            logger.warning(f"WebDriver node {node.url} health check failed: {e}")
+            ready = False
+        if ready != node.healthy:
+            logger.info(f"WebDriver node {node.url} is now {'up' if ready else 'down'}")
+        node.healthy = ready
+        node.checked_at = time.time()
+
+    def refresh_health(self, force=False):
+        """Re-probe nodes whose last check is older than the health interval"""
+        now = time.time()
+        for node in self.nodes:
+            if force or now - node.checked_at >= self.health_interval:
+                self._probe(node)
+
+    def _monitor_health(self):
+        while True:
+            self.refresh_health()
+            time.sleep(self.health_interval)
+
+    def _start_monitor(self):
+        # Started on first use rather than at import, so each forked worker runs its own
+        with self.lock:
+            if self._monitor is not None:
+                return
+            self._monitor = threading.Thread(target=self._monitor_health, name="grid-health", daemon=True)
+            self._monitor.start()
+
+    def acquire(self):
+        """Reserve a session slot on the least-loaded healthy node, or return None"""
+        self._start_monitor()
+        with self.lock:
+            candidates = [n for n in self.nodes if n.healthy and n.sessions < n.capacity]
+            if not candidates:
+                return None
+            node = min(candidates, key=lambda n: n.load)
+            node.sessions += 1
+            return node
+
+    def release(self, node):
+        with self.lock:
+            node.sessions = max(0, node.sessions - 1)
+
+    def mark_down(self, node):
+        """Take a node out of rotation until its next successful health check"""
+        with self.lock:
+            node.healthy = False
+            node.checked_at = time.time()
+        logger.warning(f"WebDriver node {node.url} marked down")
@@ -0,0 +1,415 @@
+"""The WebDriver pool and its configuration, kept free of Flask so the browser
+broker can build the same pool without importing the web app."""
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+from scheduler import BACKGROUND, INTERACTIVE, LAB_METADATA, DriverScheduler
+from webdriver_grid import RemoteGrid, parse_node_urls
+
+logger = logging.getLogger(__name__)
+
+# Chrome/ChromeDriver discovery, resolved once per process
+_chrome_binaries = None
+_chrome_binaries_lock = threading.Lock()
+
+
+def _binary_version(path):
+    """Run `<binary> --version`; None if the binary can't execute"""
+    try:
+        proc = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=20)
+        if proc.returncode == 0:
+            return proc.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return None
+
+
+def _first_working_binary(candidates):
+    for path in candidates:
+        if path and os.path.isfile(path):
+            version = _binary_version(path)
+            if version:
+                return path, version
+            logger.warning(f"Skipping {path}: --version failed")
+    return None, None
+
+
+def resolve_chrome_binaries():
+    """Locate and validate Chrome and ChromeDriver, caching the result for the process"""
+    global _chrome_binaries
+    if _chrome_binaries is not None:
+        return _chrome_binaries
+    with _chrome_binaries_lock:
+        if _chrome_binaries is not None:
+            return _chrome_binaries
+
+        chrome, chrome_version = _first_working_binary([
+            os.environ.get("CHROME_BIN"),
+            "/opt/render/project/src/.chrome-for-testing/chrome-linux64/chrome",
+            "/app/.chrome-for-testing/chrome-linux64/chrome",
+            "/usr/bin/chromium-browser",
+            "/usr/bin/chromium",
+            "/usr/bin/google-chrome",
+            "/usr/bin/google-chrome-stable",
+            "/opt/google/chrome/chrome",
+        ])
+        if chrome:
+            logger.info(f"Using Chrome binary: {chrome} ({chrome_version})")
+        else:
+            logger.warning("No Chrome binary found, using system default")
+
+        chromedriver, chromedriver_version = _first_working_binary([
+            os.environ.get("CHROMEDRIVER_PATH"),
+            "/opt/render/project/src/.chrome-for-testing/chromedriver-linux64/chromedriver",
+            "/app/.chrome-for-testing/chromedriver-linux64/chromedriver",
+            "/usr/bin/chromedriver",
+            "/usr/lib/chromium-browser/chromedriver",
+            "/usr/lib/chromium/chromedriver",
+        ])
+        if not chromedriver:
+            # Fallback to webdriver-manager, only worth trying if we have Chrome available
+            if not chrome:
+                logger.error("No Chrome binary found for webdriver-manager")
+                raise Exception("ChromeDriver setup failed: Chrome binary not found")
+            try:
+                from webdriver_manager.chrome import ChromeDriverManager
+                chromedriver = ChromeDriverManager().install()
+                chromedriver_version = _binary_version(chromedriver)
+                logger.info(f"ChromeDriver installed via webdriver-manager: {chromedriver}")
+            except Exception as e:
+                logger.error(f"Failed to install ChromeDriver: {e}")
+                raise Exception(f"ChromeDriver setup failed: {e}")
+        logger.info(f"Using ChromeDriver: {chromedriver} ({chromedriver_version})")
+
+        # Failures are not cached so a later request can retry after a transient error
+        _chrome_binaries = {
+            "chrome": chrome,
+            "chrome_version": chrome_version,
+            "chromedriver": chromedriver,
+            "chromedriver_version": chromedriver_version,
+        }
+        return _chrome_binaries
+
+
+def _shared_service_class():
+    from selenium.webdriver.chrome.service import Service
+
+    class SharedChromeService(Service):
+        """One chromedriver process that every pooled Chrome session talks to"""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.process = None
+            self._start_lock = threading.Lock()
+
+        def start(self):
+            with self._start_lock:
+                if self.process is not None and self.process.poll() is None and self.is_connectable():
+                    return
+                super().start()
+
+        def stop(self):
+            # driver.quit() calls this for every session; the pool shuts it down explicitly
+            pass
+
+        def shutdown(self):
+            super().stop()
+
+    return SharedChromeService
+
+
+# WebDriver pool for handling concurrent requests
+class WebDriverPool:
+    def __init__(self, max_drivers=10, use_contexts=True, grid=None, scheduler=None):
+        self.max_drivers = max_drivers
+        self.use_contexts = use_contexts
+        self.available_drivers = queue.Queue()
+        self.active_drivers = set()
+        self.creating = 0
+        self.lock = threading.Lock()
+        # Decides who gets the next driver; each checked-out driver holds one slot
+        self.scheduler = scheduler or DriverScheduler(max_drivers)
+        self.slots = {}
+        # driver -> (browserContextId, handle of the driver's default window)
+        self.contexts = {}
+        self.no_context_support = set()
+        self.service = None
+        self.service_lock = threading.Lock()
+        # Remote WebDriver nodes; when set, browsers run there instead of locally
+        self.grid = grid
+        self.driver_nodes = {}
+        
+    @property
+    def waiting(self):
+        """Callers queued for a driver"""
+        return self.scheduler.waiting
+    
+    def free_capacity(self):
+        """Number of drivers that could be handed out right now without waiting"""
+        with self.lock:
+            return self.max_drivers - len(self.active_drivers) - self.creating
+    
+    def get_driver(self, timeout=30, work_class=INTERACTIVE, deadline=None):
+        """Get a WebDriver instance from the pool, queueing by work class and deadline"""
+        started = time.monotonic()
+        self.scheduler.acquire(work_class, deadline=deadline, timeout=timeout)
+        try:
+            driver = self._get_driver(max(1, timeout - (time.monotonic() - started)))
+        except Exception:
+            self.scheduler.release(work_class)
+            raise
+        self.slots[driver] = work_class
+        return driver
+    
+    def _release_slot(self, driver):
+        work_class = self.slots.pop(driver, None)
+        if work_class is not None:
+            self.scheduler.release(work_class)
+    
+    def _get_driver(self, timeout):
+        try:
+            # Try to get an existing driver
+            driver = self.available_drivers.get_nowait()
+            if self._on_down_node(driver):
+                self._cleanup_driver(driver)
+                return self._get_driver(timeout)
+            with self.lock:
+                self.active_drivers.add(driver)
+            return self._checkout(driver)
+        except queue.Empty:
+            # Create new driver if under limit; reserve the place, then start the
+            # browser outside the lock since that can take seconds
+            with self.lock:
+                can_create = len(self.active_drivers) + self.creating < self.max_drivers
+                if can_create:
+                    self.creating += 1
+            if can_create:
+                try:
+                    driver = self._create_driver()
+                except Exception as e:
+                    logger.error(f"Failed to create WebDriver: {e}")
+                    with self.lock:
+                        self.creating -= 1
+                    raise
+                with self.lock:
+                    self.creating -= 1
+                    self.active_drivers.add(driver)
+                    logger.info(f"Created new WebDriver. Active: {len(self.active_drivers)}")
+                return self._checkout(driver)
+            
+            # Holding a scheduler slot, so a driver is about to be returned
+            try:
+                driver = self.available_drivers.get(timeout=timeout)
+                with self.lock:
+                    self.active_drivers.add(driver)
+            except queue.Empty:
+                raise TimeoutError("No WebDriver available within timeout")
+            return self._checkout(driver)
+    
+    def return_driver(self, driver):
+        """Return a WebDriver instance to the pool"""
+        try:
+            # Reset driver state
+            if driver in self.contexts:
+                self._close_context(driver)
+            else:
+                driver.delete_all_cookies()
+                driver.get("about:blank")
+            
+            with self.lock:
+                self.active_drivers.discard(driver)
+            self.available_drivers.put(driver)
+            self._release_slot(driver)
+        except Exception as e:
+            logger.error(f"Error returning driver to pool: {e}")
+            self._cleanup_driver(driver)
+    
+    def _on_down_node(self, driver):
+        node = self.driver_nodes.get(driver)
+        return node is not None and not node.healthy
+    
+    def _checkout(self, driver):
+        """Give the caller a fresh, isolated browser context on a long-lived Chrome"""
+        if self.use_contexts and driver not in self.no_context_support:
+            try:
+                self._open_context(driver)
+            except Exception as e:
+                # Older Chrome or a remote session without CDP: fall back to cookie wiping
+                logger.warning(f"Browser contexts unavailable, using shared profile: {e}")
+                self.no_context_support.add(driver)
+        return driver
+    
+    def _open_context(self, driver):
+        """Create an incognito-like browser context with one tab and switch into it"""
+        base_handle = driver.current_window_handle
+        before = set(driver.window_handles)
+        context_id = driver.execute_cdp_cmd("Target.createBrowserContext", {})["browserContextId"]
+        try:
+            target_id = driver.execute_cdp_cmd(
+                "Target.createTarget", {"url": "about:blank", "browserContextId": context_id}
+            )["targetId"]
+            handles = set(driver.window_handles)
+            if target_id in handles:
+                handle = target_id
+            else:
+                new_handles = handles - before
+                if len(new_handles) != 1:
+                    raise Exception("ChromeDriver did not expose the new context's tab")
+                handle = new_handles.pop()
+            driver.switch_to.window(handle)
+        except Exception:
+            driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context_id})
+            raise
+        self.contexts[driver] = (context_id, base_handle)
+    
+    def _close_context(self, driver):
+        """Dispose the user's context: its tabs, cookies, storage and cache go with it"""
+        context_id, base_handle = self.contexts.pop(driver)
+        driver.switch_to.window(base_handle)
+        driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context_id})
+    
+    def _create_driver(self):
+        """Create a new WebDriver instance"""
+        if self.grid:
+            return self._create_remote_driver()
+
+        from selenium import webdriver
+
+        options = self._build_chrome_options()
+        service = self._create_chromedriver_service()
+        
+        driver = webdriver.Chrome(service=service, options=options)
+        driver.set_page_load_timeout(30)
+        driver.implicitly_wait(10)
+        return driver
+    
+    def _create_remote_driver(self):
+        """Start a session on the least-loaded healthy grid node"""
+        from selenium import webdriver
+
+        options = self._build_chrome_options(local=False)
+        for _ in range(len(self.grid.nodes)):
+            node = self.grid.acquire()
+            if node is None:
+                break
+            try:
+                driver = webdriver.Remote(command_executor=node.url, options=options)
+            except Exception as e:
+                logger.error(f"Failed to start session on WebDriver node {node.url}: {e}")
+                self.grid.release(node)
+                self.grid.mark_down(node)
+                continue
+            driver.set_page_load_timeout(30)
+            driver.implicitly_wait(10)
+            self.driver_nodes[driver] = node
+            # Remote sessions have no CDP endpoint, so users are isolated by wiping cookies
+            self.no_context_support.add(driver)
+            logger.info(f"Started remote WebDriver session on {node.url}")
+            return driver
+        raise Exception("No healthy WebDriver node with free capacity")
+    
+    def _build_chrome_options(self, local=True):
+        """Build Chrome options for WebDriver"""
+        from selenium.webdriver.chrome.options import Options
+
+        options = Options()
+        options.add_argument("--headless=new")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--window-size=1920,1080")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-plugins")
+        options.add_argument("--disable-images")
+        options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option('useAutomationExtension', False)
+        
+        if local:
+            chrome = resolve_chrome_binaries()["chrome"]
+            if chrome:
+                options.binary_location = chrome
+        
+        return options
+    
+    def _create_chromedriver_service(self):
+        """Return the pool's shared ChromeDriver service, starting it on first use"""
+        with self.service_lock:
+            if self.service is None:
+                path = resolve_chrome_binaries()["chromedriver"]
+                self.service = _shared_service_class()(path)
+            self.service.start()
+            return self.service
+    
+    def _cleanup_driver(self, driver):
+        """Clean up a WebDriver instance"""
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.error(f"Error cleaning up driver: {e}")
+        finally:
+            with self.lock:
+                self.active_drivers.discard(driver)
+            self.contexts.pop(driver, None)
+            self.no_context_support.discard(driver)
+            node = self.driver_nodes.pop(driver, None)
+            if node is not None:
+                self.grid.release(node)
+            self._release_slot(driver)
+    
+    def cleanup_all(self):
+        """Clean up all WebDriver instances"""
+        logger.info("Cleaning up WebDriver pool...")
+        
+        # Clean up available drivers
+        while not self.available_drivers.empty():
+            try:
+                driver = self.available_drivers.get_nowait()
+                self._cleanup_driver(driver)
+            except queue.Empty:
+                break
+        
+        # Clean up active drivers
+        with self.lock:
+            active = list(self.active_drivers)
+        for driver in active:
+            self._cleanup_driver(driver)
+        
+        if self.service is not None:
+            self.service.shutdown()
+            self.service = None
+
+
+# Optional remote WebDriver nodes, e.g. "http://selenium:4444=4,http://node2:4444"
+WEBDRIVER_REMOTE_URLS = os.environ.get("WEBDRIVER_REMOTE_URLS", "")
+remote_grid = RemoteGrid(
+    parse_node_urls(WEBDRIVER_REMOTE_URLS, int(os.environ.get("WEBDRIVER_NODE_CAPACITY", "2"))),
+    health_interval=int(os.environ.get("WEBDRIVER_HEALTH_INTERVAL", "30")),
+) if WEBDRIVER_REMOTE_URLS else None
+
+# Reduce concurrent drivers for Render; with remote nodes their slots set the limit
+MAX_DRIVERS = remote_grid.total_capacity() if remote_grid else 3
+
+# Uploads > interactive logins > lab dropdown lookups > background refresh.
+# Lookups leave a driver for logins and background work never takes more than one.
+driver_scheduler = DriverScheduler(
+    MAX_DRIVERS,
+    caps={LAB_METADATA: max(1, MAX_DRIVERS - 1), BACKGROUND: 1},
+    aging_seconds=float(os.environ.get("SCHEDULER_AGING_SECONDS", "10")),
+)
+
+
+def build_local_pool():
+    """The WebDriver pool as configured by the environment, owning its browsers"""
+    return WebDriverPool(
+        max_drivers=MAX_DRIVERS,
+        use_contexts=os.environ.get("BROWSER_CONTEXTS", "1") == "1",
+        grid=remote_grid,
+        scheduler=driver_scheduler,
+    )